@@ -0,0 +1,116 @@
+# bench_value_range_decode.py
+"""
+对比 values_batch_get 的原解析方式（resp.json()）与现在的 fast_decode.decode_value_ranges（orjson）
+- 解码：查履约读取表数据实际使用的 values_batch_get 响应
+- 解码 + 筛选订单号：原先 _extract_orders 的逐行循环 vs LVYUE_ORDER_FILTER 分块列式筛选（iter_matches）
+响应体由 modes/feishu/mock_server.py 的模拟数据离线生成，不发起网络请求
+
+运行：python -m benchmarks.bench_value_range_decode --rows 100000 --repeat 5
+"""
+import json
+import time
+import argparse
+import tracemalloc
+import requests
+from modes.feishu import mock_server, fast_decode
+from modes.feishu.feishu_client import feishu_client
+from modes.feishu.feishu_sheet import values_batch_get
+from modes.mode_cha_lvyue import LVYUE_COLUMNS, LVYUE_ORDER_FILTER, get_range_str
+
+SPREADSHEET_TOKEN = "mocksht0000"
+SHEET_ID = "0000s0"
+
+
+def build_payload(rows: int, columns: int) -> bytes:
+    mock_server.config.update(rows=rows, columns=columns)
+    value_range = f"{SHEET_ID}!{get_range_str(rows, columns)}"
+    body = {"code": 0, "msg": "success",
+            "data": {"revision": 1, "spreadsheetToken": SPREADSHEET_TOKEN,
+                     "valueRanges": [mock_server.read_range(SPREADSHEET_TOKEN, value_range)]}}
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def serve(content: bytes):
+    """让 feishu_client.get 直接返回预先生成的响应"""
+    def get(path, **kwargs):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = content
+        resp.encoding = "utf-8"
+        return resp
+    feishu_client.get = get
+
+
+def measure(fn, repeat: int):
+    """返回 (最快耗时秒, 峰值内存 MB, 结果)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="valueRange 解码基准测试")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=18)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    content = build_payload(args.rows, args.columns)
+    serve(content)
+    value_range = f"{SHEET_ID}!{get_range_str(args.rows, args.columns)}"
+    print(f"响应体 {len(content) / 1024 / 1024:.1f} MB，{args.rows} 行 x {args.columns} 列，"
+          f"解析器: {'orjson' if fast_decode.orjson else 'json'}")
+
+    def filter_rows(values):
+        """原先 _extract_orders 中的逐行循环"""
+        header = values[0]
+        idx_xh, idx_ly, idx_order = (header.index(name) for name in LVYUE_COLUMNS)
+        orders = []
+        for row in values[1:]:
+            xh = row[idx_xh] if idx_xh < len(row) else None
+            ly = row[idx_ly] if idx_ly < len(row) else None
+            order = row[idx_order] if idx_order < len(row) else None
+            if xh not in (None, "", "null") and ly in (None, "", "null") and order not in (None, "", "null"):
+                orders.append(order)
+        return orders
+
+    def filter_chunks(values):
+        """现在 _extract_orders 中的分块列式筛选"""
+        return [order for matched in LVYUE_ORDER_FILTER.iter_matches(values) for order in matched["订单号"].tolist()]
+
+    def json_batch_get():
+        """原先 values_batch_get 的解析方式"""
+        data = feishu_client.get("values_batch_get").json()
+        return [value_range.get("values") for value_range in data["data"]["valueRanges"]]
+
+    def fast_batch_get():
+        return values_batch_get("token", SPREADSHEET_TOKEN, [value_range])
+
+    values = fast_batch_get()[0]
+    cases = [
+        ("resp.json()", json_batch_get),
+        ("values_batch_get", fast_batch_get),
+        ("仅筛选：逐行循环", lambda: filter_rows(values)),
+        ("仅筛选：列式筛选", lambda: filter_chunks(values)),
+        ("resp.json() + 逐行循环", lambda: filter_rows(json_batch_get()[0])),
+        ("values_batch_get + 列式筛选", lambda: filter_chunks(fast_batch_get()[0])),
+    ]
+    print(f"{'方式':<28}{'耗时(s)':>10}{'峰值内存(MB)':>16}")
+    results = {}
+    for name, fn in cases:
+        elapsed, peak, results[name] = measure(fn, args.repeat)
+        print(f"{name:<28}{elapsed:>10.3f}{peak:>16.1f}")
+    assert results["resp.json() + 逐行循环"] == results["values_batch_get + 列式筛选"], "两种方式筛选结果不一致"
+    print(f"筛选出订单号 {len(results['values_batch_get + 列式筛选'])} 条，两种方式结果一致")
+
+
+if __name__ == "__main__":
+    main()
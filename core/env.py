@@ -36,10 +36,42 @@ tokens = get_env("SPREADSHEET_TOKEN")
 SPREADSHEET_TOKEN = tokens.split(",") if tokens else []
 SHEET_ID = get_env("SHEET_ID")
 
+# 飞书接口连接
+FEISHU_BASE_URL = get_env("FEISHU_BASE_URL", "https://open.feishu.cn/open-apis")
+FEISHU_POOL_SIZE = int(get_env("FEISHU_POOL_SIZE", 10))
+FEISHU_CONNECT_TIMEOUT = float(get_env("FEISHU_CONNECT_TIMEOUT", 5))
+FEISHU_READ_TIMEOUT = float(get_env("FEISHU_READ_TIMEOUT", 30))
+# 频控 / 5xx 时的最大重试次数
+FEISHU_MAX_RETRIES = int(get_env("FEISHU_MAX_RETRIES", 5))
+# 并发拉取表数据的线程数（需兼顾飞书应用的 QPS 限制）
+FEISHU_MAX_WORKERS = int(get_env("FEISHU_MAX_WORKERS", 5))
+# 相同 GET 请求的结果缓存时间（秒）、条数与单条大小上限
+FEISHU_READ_CACHE_TTL = float(get_env("FEISHU_READ_CACHE_TTL", 2))
+FEISHU_READ_CACHE_SIZE = int(get_env("FEISHU_READ_CACHE_SIZE", 128))
+FEISHU_READ_CACHE_MAX_BYTES = int(get_env("FEISHU_READ_CACHE_MAX_BYTES", 1024 * 1024))
+
+# 本地模拟飞书接口（modes/feishu/mock_server.py），压测时将 FEISHU_BASE_URL 指向它
+MOCK_FEISHU_PORT = int(get_env("MOCK_FEISHU_PORT", 3001))
+MOCK_SPREADSHEETS = int(get_env("MOCK_SPREADSHEETS", 4))
+MOCK_SHEETS = int(get_env("MOCK_SHEETS", 3))
+MOCK_ROWS = int(get_env("MOCK_ROWS", 1000))
+MOCK_COLUMNS = int(get_env("MOCK_COLUMNS", 18))
+MOCK_LATENCY_MS = int(get_env("MOCK_LATENCY_MS", 0))
+MOCK_THROTTLE_RATE = float(get_env("MOCK_THROTTLE_RATE", 0))
+MOCK_ERROR_RATE = float(get_env("MOCK_ERROR_RATE", 0))
+MOCK_QPS = int(get_env("MOCK_QPS", 0))
+
 #持久化数据
 USER_DATA_FILE = get_env("USER_DATA_FILE")
 TOKEN_STORE_FILE = get_env("TOKEN_STORE_FILE")
 SHEET_STORE_FILE = get_env("SHEET_STORE_FILE")
+# 距离 user_access_token 过期多少秒时主动刷新
+TOKEN_REFRESH_MARGIN = int(get_env("TOKEN_REFRESH_MARGIN", 300))
+METADATA_STORE_FILE = get_env("METADATA_STORE_FILE", "metadata_cache.json")
+DRIVE_INDEX_FILE = get_env("DRIVE_INDEX_FILE", "drive_index.json")
+ORDER_INDEX_FILE = get_env("ORDER_INDEX_FILE", "order_index.npz")
+# 表格元数据缓存有效期（秒）
+METADATA_CACHE_TTL = int(get_env("METADATA_CACHE_TTL", 600))
 
 for path in [LOG_DIR, CONFIG_DIR, PERSISTENCE_DIR, EXCEL_DIR]:
     path.mkdir(parents=True, exist_ok=True)
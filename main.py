@@ -5,7 +5,6 @@
 import flet as ft
 import flet_webview as ftwv
 import asyncio
-import time
 from ui.console import Console
 from core.logger import logger
 from ui.pages.home_page import HomePage
@@ -14,8 +13,10 @@ from ui.pages.page_cha_lvyue import LvYuePage
 from ui.pages.page_tongguo_yangpin import YangPingPage
 from ui.pages.page_cui_shipinma import ShiPingMaPage
 from ui.pages.page_cha_daohuo import DaoHuoPage
-from modes.feishu.feishu_auth import start_authorize_flow, exchange_code_for_token
+from modes.feishu.feishu_auth import start_authorize_flow
+from modes.feishu.token_manager import TokenManager
 from modes.feishu.feishu_sheet import append_to_sheet, col_num_to_letter
+from modes.feishu.feishu_client import feishu_client, async_feishu_client
 from core.env import TOKEN_STORE_FILE, SHEET_STORE_FILE
 from modes.persistence.storage import Storage
 
@@ -35,6 +36,11 @@ class MainApp:
         #storage
         self.token_storage = Storage(TOKEN_STORE_FILE)
         self.sheet_storage = Storage(SHEET_STORE_FILE)
+        # 令牌管理：所有飞书请求都从这里取最新的 token
+        self.token_manager = TokenManager(self.token_storage)
+        self.token_manager.add_listener(self._on_token_changed)
+        feishu_client.set_token_manager(self.token_manager)
+        async_feishu_client.set_token_manager(self.token_manager)
         # 保存引用到page.data供其他组件访问
         if self.page.data is None:
             self.page.data = {}
@@ -42,7 +48,7 @@ class MainApp:
         self.setup_page()
         self.build_ui()
         self._check_stored_token()
-        self.home_page.on_update_cache_click(None)
+        self.page.run_task(self.home_page.on_update_cache_click_async, None)
         # 启动异步服务器
         self.page.run_task(self._start_local_server)
         logger.success("回调服务器启动 => 127.0.0.1:3000/callback")
@@ -213,24 +219,29 @@ class MainApp:
         logger.success("欢迎使用CKLJJ现代化飞书")
 
     def _check_stored_token(self):
-        """检查存储的令牌是否有效"""
-        token = self.token_storage.get("user_token")
-        expire_time = self.token_storage.get("expire_time")
-        if token and expire_time:
-            current_time = int(time.time())
-            if current_time < expire_time:
-                logger.info(f"找到有效令牌: {token[:10]}...，到期时间: {expire_time}")
-                self.access_token = token
-                self._set_auth_status(True)
-                return True
-            else:
-                logger.info("存储的令牌已过期，需重新授权")
-                self.token_storage.delete("user_token")
-                self.token_storage.delete("expire_time")
+        """检查存储的令牌是否有效，过期时尝试用 refresh_token 刷新"""
+        token = self.token_manager.access_token
+        if token and (self.token_manager.is_valid() or self.token_manager.refresh()):
+            token = self.token_manager.access_token
+            logger.info(f"找到有效令牌: {token[:10]}...，到期时间: {self.token_manager.expire_time}")
+            self.access_token = token
+            self._set_auth_status(True)
+            self.token_manager.start()
+            return True
+        elif token:
+            logger.info("存储的令牌已过期，需重新授权")
+            self.token_manager.clear()
         else:
             logger.info("未找到有效令牌，需进行授权")
         return False
 
+    def _on_token_changed(self, token):
+        """令牌刷新或失效（可能在后台线程中调用）"""
+        self.access_token = token
+        if token is None and self.auth_status:
+            logger.warning("令牌已失效，请重新授权")
+            self._set_auth_status(False)
+
     def _add_home_tab(self, index):
         """添加主页标签"""
         self.home_page = HomePage()
@@ -262,6 +273,8 @@ class MainApp:
         lvyue_excel = ExcelTool(
             file_name="查履约test.xlsx",
             header_row=1,
+            # 应用自己生成的文件，再次启动时仍用 write-only 快速重建
+            managed=True,
         )
 
         lvyue_excel.save()
@@ -461,11 +474,10 @@ class MainApp:
             return
 
         try:
-            token, expires_in = exchange_code_for_token(last_code)
-            expire_time = int(time.time()) + expires_in - 1000
-            self.token_storage.set("user_token", token)
-            self.token_storage.set("expire_time", expire_time)
+            token = await self.token_manager.exchange_code_async(last_code)
+            expire_time = self.token_manager.expire_time
             self.access_token = token
+            self.token_manager.start()
             logger.success(f"飞书授权成功! token={token[:10]}...，到期时间={expire_time}")
             self._set_auth_status(True)
             self.page.snack_bar = ft.SnackBar(ft.Text("飞书授权成功 ✅"))
@@ -1,10 +1,17 @@
 ﻿import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
-from typing import List, Tuple, Any, Union, Optional
+from openpyxl.cell import WriteOnlyCell
+from typing import List, Tuple, Any, Union, Optional, Iterator, Sequence, Iterable, Dict
 from openpyxl.worksheet.worksheet import Worksheet
 import os
+from itertools import chain
+from pathlib import Path
 from core.env import EXCEL_DIR
+from modes.excel.workbook_cache import workbook_cache
+from modes.excel.save_worker import save_worker
+from concurrent.futures import Future
+import threading
 import uuid
 import time
 
@@ -14,8 +21,13 @@ class ExcelTool:
             self,
             default_headers: Optional[List[str]] = None,
             header_row: int = 1,
-            file_name: Optional[str] = None
+            file_name: Optional[str] = None,
+            managed: Optional[bool] = None
     ):
+        """
+        :param managed: 文件是否由本应用生成（没有需要保留的格式）；为 None 时只有本次新建的文件算作 managed，
+                        应用自己的固定文件名（再次启动时已存在）应显式传入 True，整表覆写才能继续走 write-only 重建
+        """
         if header_row < 1:
             raise ValueError("Header row must be 1 or greater.")
         self.default_headers = default_headers or ['序号', 'BD', '达人名称', '带货店铺', '样品名', '合作类型', '发样数量','性别','粉丝量','履约率','主页链接','佣金率','寄样批准日期','发货日期','订单号','履约方式','创作视频链接','视频码']
@@ -23,7 +35,31 @@ class ExcelTool:
         if not file_name:
             file_name = f"excel_{uuid.uuid4().hex[:8]}_{int(time.time())}.xlsx"
         self.file_path = EXCEL_DIR.joinpath(file_name)
-        self.workbook = self.load_workbook(self.file_path) if os.path.exists(self.file_path) else self.create_workbook()
+        # 已存在的文件在首次访问 workbook 时才加载
+        self._workbook = None if os.path.exists(self.file_path) else self.create_workbook()
+        # 由本工具新建的文件没有需要保留的格式，整表覆写时可以用 write-only 模式重建
+        self.managed = self._workbook is not None if managed is None else managed
+        # 外部修改导致重新加载时递增；单个工作表被写入时递增其版本号
+        self._generation = 0
+        self._sheet_versions = {}
+        # 后台保存序列化工作簿时，不允许同时修改单元格
+        self._lock = threading.RLock()
+
+    @property
+    def workbook(self) -> openpyxl.Workbook:
+        if self._workbook is None:
+            # 文件未变化时复用缓存中的工作簿
+            self._workbook = workbook_cache.get(self.file_path, self.load_workbook)
+        return self._workbook
+
+    @workbook.setter
+    def workbook(self, workbook: Optional[openpyxl.Workbook]) -> None:
+        self._workbook = workbook
+        self._generation += 1
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._workbook is not None
 
     def create_workbook(self) -> openpyxl.Workbook:
         return openpyxl.Workbook()
@@ -36,10 +72,79 @@ class ExcelTool:
         except Exception as e:
             raise ValueError(f"加载文件失败: {str(e)}")
 
-    def save(self) -> None:
-        self.workbook.save(self.file_path)
+    def open_read_only(self) -> openpyxl.Workbook:
+        """以只读模式打开磁盘上的文件：按需流式解析，不构建完整的单元格对象模型（读取的是已保存的内容）"""
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"文件路径 {self.file_path} 不存在.")
+        # 记录读取时的文件状态，之后的外部修改可以被 refresh 发现
+        workbook_cache.remember(self.file_path)
+        return openpyxl.load_workbook(self.file_path, read_only=True)
+
+    def save(self, wait: bool = False) -> Future:
+        """
+        后台保存：写入同目录的临时文件后原子替换，连续多次保存合并为一次写入
+        :param wait: 是否等待写入完成（失败时抛出异常）
+        :return: 写入完成时结束的 Future
+        """
+        # 提交时确定写入的文件与工作簿，之后切换文件不会写错位置
+        path, workbook = self.file_path, self._workbook
+        future = save_worker.submit(path, lambda: self._write_workbook(path, workbook))
+        if wait:
+            future.result()
+        return future
+
+    def _write_workbook(self, path, workbook: Optional[openpyxl.Workbook]) -> None:
+        # 未加载说明没有改动，磁盘上的文件就是最新的
+        if workbook is None:
+            return
+        with self._lock:
+            self.replace_file(workbook.save, path)
+            # 记录保存后的 mtime / 大小，自己的写入不会触发重新加载
+            workbook_cache.put(path, workbook)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待当前文件排队中的保存全部完成"""
+        return save_worker.flush(self.file_path, timeout)
+
+    async def flush_async(self, timeout: Optional[float] = None) -> bool:
+        return await save_worker.flush_async(self.file_path, timeout)
+
+    def refresh(self) -> bool:
+        """
+        检查磁盘文件是否被外部修改，是则丢弃内存中的工作簿（下次访问时重新加载）
+        :return: 是否检测到外部修改
+        """
+        # 自己的保存尚未完成时文件状态还没有记录，不能当作外部修改
+        if save_worker.is_pending(self.file_path) or not workbook_cache.is_stale(self.file_path):
+            return False
+        workbook_cache.invalidate(self.file_path)
+        self._workbook = None
+        self._generation += 1
+        return True
+
+    def mark_dirty(self, sheet: Union[str, Worksheet]) -> None:
+        """标记工作表内容已变化"""
+        name = sheet if isinstance(sheet, str) else sheet.title
+        self._sheet_versions[name] = self._sheet_versions.get(name, 0) + 1
+
+    def sheet_state(self, sheet_name: str) -> Tuple[str, str, int, int]:
+        """工作表的内容版本：相同说明自上次读取后没有任何写入或外部修改，可以直接复用上次的结果"""
+        return str(self.file_path), sheet_name, self._generation, self._sheet_versions.get(sheet_name, 0)
+
+    def iter_sheet_values(self, sheet_name: str) -> Iterator[Tuple[Any, ...]]:
+        """逐行读取整个工作表（含表头）：已加载时读内存，否则流式读磁盘，不为了读取而加载完整的对象模型"""
+        if self._workbook is not None:
+            return self.get_sheet(sheet_name).iter_rows(values_only=True)
+        return self.iter_rows(sheet_name, start_row=1, skip_headers=False)
 
     def get_sheet_names(self) -> List[str]:
+        if self._workbook is None and os.path.exists(self.file_path):
+            # 只读模式只解析工作簿目录，不必为了表名加载全部单元格
+            workbook = self.open_read_only()
+            try:
+                return workbook.sheetnames
+            finally:
+                workbook.close()
         return self.workbook.sheetnames
 
     def get_sheet(self, sheet_name: str) -> openpyxl.worksheet.worksheet.Worksheet:
@@ -56,7 +161,9 @@ class ExcelTool:
             header_alignment: Optional[Alignment] = None,
             header_fill: Optional[PatternFill] = None
     ) -> openpyxl.worksheet.worksheet.Worksheet:
-        sheet = self.workbook.create_sheet(sheet_name, position)
+        with self._lock:
+            sheet = self.workbook.create_sheet(sheet_name, position)
+        self.mark_dirty(sheet)
         headers_to_write = headers if headers is not None else self.default_headers
         if headers_to_write:
             for col, header in enumerate(headers_to_write, start=1):
@@ -76,7 +183,9 @@ class ExcelTool:
         expected = expected_headers if expected_headers is not None else self.default_headers
         if not expected:
             return True
-        actual_headers = [sheet.cell(row=self.header_row, column=col).value for col in range(1, len(expected) + 1)]
+        # sheet.cell 会为不存在的坐标创建单元格，与后台保存并发时同样需要加锁
+        with self._lock:
+            actual_headers = [sheet.cell(row=self.header_row, column=col).value for col in range(1, len(expected) + 1)]
         return actual_headers == expected
 
     def write_cell(
@@ -89,20 +198,25 @@ class ExcelTool:
             alignment: Optional[Alignment] = None,
             fill: Optional[PatternFill] = None
     ) -> None:
-        cell = sheet.cell(row=row, column=col)
-        cell.value = value
-        if font:
-            cell.font = font
-        if alignment:
-            cell.alignment = alignment
-        if fill:
-            cell.fill = fill
+        with self._lock:
+            cell = sheet.cell(row=row, column=col)
+            cell.value = value
+            if font:
+                cell.font = font
+            if alignment:
+                cell.alignment = alignment
+            if fill:
+                cell.fill = fill
+        self.mark_dirty(sheet)
 
     def read_cell(self, sheet: openpyxl.worksheet.worksheet.Worksheet, row: int, col: int) -> Any:
-        return sheet.cell(row=row, column=col).value
+        with self._lock:
+            return sheet.cell(row=row, column=col).value
 
     def append_row(self, sheet: openpyxl.worksheet.worksheet.Worksheet, data: List[Any]) -> None:
-        sheet.append(data)
+        with self._lock:
+            sheet.append(data)
+        self.mark_dirty(sheet)
 
     def get_row_count(self, sheet: openpyxl.worksheet.worksheet.Worksheet) -> int:
         return sheet.max_row
@@ -121,10 +235,291 @@ class ExcelTool:
     ) -> List[List[Any]]:
         if skip_headers and start_row <= self.header_row:
             start_row = self.header_row + 1
-        return [
-            [sheet.cell(row=row, column=col).value for col in range(start_col, end_col + 1)]
-            for row in range(start_row, end_row + 1)
-        ]
+        if end_row < start_row:
+            return []
+        with self._lock:
+            return [
+                list(row) for row in sheet.iter_rows(
+                    min_row=start_row, max_row=end_row, min_col=start_col, max_col=end_col, values_only=True
+                )
+            ]
+
+    def resolve_columns(self, headers: Sequence[Any], columns: Optional[Sequence[Union[str, int]]]) -> List[int]:
+        """
+        列选择转换为 1-based 列号
+        :param columns: 表头名称或 1-based 列号（也可以是 range），为 None 时选择全部列；不存在的表头名称会被忽略
+        """
+        if columns is None:
+            return list(range(1, len(headers) + 1))
+        indices = []
+        for column in columns:
+            if isinstance(column, int):
+                indices.append(column)
+            elif column in headers:
+                indices.append(list(headers).index(column) + 1)
+        return indices
+
+    def read_headers(self, sheet_name: str) -> List[Any]:
+        """流式读取表头行"""
+        workbook = self.open_read_only()
+        try:
+            sheet = workbook[sheet_name]
+            header = next(sheet.iter_rows(min_row=self.header_row, max_row=self.header_row, values_only=True), ())
+            return list(header)
+        finally:
+            workbook.close()
+
+    def iter_rows(
+            self,
+            sheet_name: str,
+            columns: Optional[Sequence[Union[str, int]]] = None,
+            start_row: Optional[int] = None,
+            end_row: Optional[int] = None,
+            skip_headers: bool = True
+    ) -> Iterator[Tuple[Any, ...]]:
+        """
+        流式逐行读取（openpyxl read_only + iter_rows(values_only=True)），内存占用与文件大小无关
+        :param columns: 只读取这些列（表头名称或 1-based 列号），按给定顺序返回；为 None 时读取到工作表的最后一列
+                        （与已加载时 iter_rows 一致，表头右侧的单元格不会被丢弃）
+        :param start_row: 起始行（1-based，含），默认从表头下一行开始
+        :param end_row: 结束行（1-based，含），默认读到最后一行
+        :param skip_headers: 窗口覆盖表头行时是否跳过表头
+        :return: 生成器，逐行产出单元格值的元组；行尾为空的单元格补 None
+        """
+        workbook = self.open_read_only()
+        try:
+            sheet = workbook[sheet_name]
+            if start_row is None or (skip_headers and start_row <= self.header_row):
+                start_row = self.header_row + 1 if skip_headers else 1
+            if columns is None:
+                # 不做列投影；维度信息缺失时各行长度可能不同，补齐到已读到的最大宽度
+                width = sheet.max_column or 0
+                for row in sheet.iter_rows(min_row=start_row, max_row=end_row, values_only=True):
+                    width = max(width, len(row))
+                    yield tuple(row) + (None,) * (width - len(row))
+                return
+
+            headers = next(sheet.iter_rows(min_row=self.header_row, max_row=self.header_row, values_only=True), ())
+            indices = self.resolve_columns(headers, columns)
+            if not indices:
+                return
+            min_col, max_col = min(indices), max(indices)
+            offsets = [idx - min_col for idx in indices]
+            width = max_col - min_col + 1
+
+            for row in sheet.iter_rows(min_row=start_row, max_row=end_row, min_col=min_col, max_col=max_col,
+                                       values_only=True):
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                yield tuple(row[offset] for offset in offsets)
+        finally:
+            workbook.close()
+
+    def iter_row_windows(
+            self,
+            sheet_name: str,
+            window: int = 5000,
+            columns: Optional[Sequence[Union[str, int]]] = None,
+            start_row: Optional[int] = None,
+            end_row: Optional[int] = None
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """按 window 行一块流式读取，适合分块处理的筛选 / 导出"""
+        chunk = []
+        for row in self.iter_rows(sheet_name, columns, start_row, end_row):
+            chunk.append(row)
+            if len(chunk) >= window:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def write_sheet_rows(
+            self,
+            sheet_name: str,
+            rows: Iterable[Sequence[Any]],
+            headers: Optional[Sequence[Any]] = None,
+            column_formats: Optional[Dict[Union[str, int], str]] = None,
+            column_widths: Optional[Dict[Union[str, int], float]] = None,
+            header_font: Optional[Font] = None
+    ) -> int:
+        """
+        整表覆写，写入期间原文件保持不变，失败时不会留下半个文件
+        - 本工具新建的文件（managed）：用 openpyxl write-only 模式从可迭代的行重新生成整个文件后原子替换，
+          其他工作表只保留单元格值；写入后内存中的 workbook 失效，下次访问时重新加载
+        - 其他文件（用户选择的 Excel）：只在已加载的工作簿中替换目标工作表的单元格值，
+          字体、填充、合并单元格、列宽、数据验证、图片以及其他工作表都保持不变，然后原子保存
+        :param rows: 数据行（不含表头），可以是生成器
+        :param headers: 表头，写在第一行
+        :param column_formats: 列的数字格式，如 {"发货日期": "yyyy-mm-dd", 3: "0.00%"}
+        :param column_widths: 列宽，如 {"订单号": 24}
+        :param header_font: 表头字体
+        :return: 写入的数据行数
+        """
+        # 先等排队中的后台保存写完，避免旧内容覆盖重建后的文件
+        self.flush()
+        headers = list(headers) if headers is not None else None
+        formats = self._by_column_index(headers or [], column_formats)
+        widths = self._by_column_index(headers or [], column_widths)
+        if not self.managed:
+            return self._replace_sheet_cells(sheet_name, rows, headers, formats, widths, header_font)
+
+        # 其他工作表的来源：已加载时用内存中的 workbook（含未保存的改动），否则只读流式读取磁盘文件
+        if self.is_loaded:
+            source = self._workbook
+        elif os.path.exists(self.file_path):
+            source = self.open_read_only()
+        else:
+            source = None
+        sources = list(source.sheetnames) if source is not None else []
+        if sheet_name not in sources:
+            sources.append(sheet_name)
+
+        output = openpyxl.Workbook(write_only=True)
+        try:
+            count = self._write_sheets(output, source, sources, sheet_name, rows, headers, formats, widths,
+                                       header_font)
+        finally:
+            if source is not None and source is not self._workbook:
+                source.close()
+
+        self.replace_file(output.save)
+        # 记录重建后的文件状态（不缓存工作簿），之后的外部修改可以被 refresh 发现
+        workbook_cache.put(self.file_path, None)
+        self._workbook = None
+        self.mark_dirty(sheet_name)
+        return count
+
+    def _replace_sheet_cells(self, sheet_name, rows, headers, formats, widths, header_font) -> int:
+        """在已加载的工作簿中逐行覆写目标工作表的值，行内多出来的旧单元格清空（样式保留），多出来的旧行删除"""
+        workbook = self.workbook
+        count = 0
+        with self._lock:
+            sheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.create_sheet(sheet_name)
+            old_rows, old_cols = sheet.max_row, sheet.max_column
+            row_idx = 0
+            if headers is not None:
+                row_idx += 1
+                self._overwrite_row(sheet, row_idx, headers, old_cols)
+                if header_font:
+                    for col in range(1, len(headers) + 1):
+                        sheet.cell(row=row_idx, column=col).font = header_font
+            for row in rows:
+                row_idx += 1
+                count += 1
+                self._overwrite_row(sheet, row_idx, row, old_cols)
+                for idx, fmt in formats.items():
+                    if idx <= len(row):
+                        sheet.cell(row=row_idx, column=idx).number_format = fmt
+            # 多出来的旧行直接删除（只清空值的话 max_row 不变，读取时会得到大量空行）
+            if old_rows > row_idx:
+                sheet.delete_rows(row_idx + 1, old_rows - row_idx)
+            for idx, width in widths.items():
+                sheet.column_dimensions[get_column_letter(idx)].width = width
+        self.mark_dirty(sheet)
+        self.save(wait=True)
+        return count
+
+    @staticmethod
+    def _overwrite_row(sheet: Worksheet, row_idx: int, values: Sequence[Any], old_cols: int) -> None:
+        for col_idx, value in enumerate(values, start=1):
+            sheet.cell(row=row_idx, column=col_idx).value = value
+        for col_idx in range(len(values) + 1, old_cols + 1):
+            sheet.cell(row=row_idx, column=col_idx).value = None
+
+    def _by_column_index(self, headers: Sequence[Any], mapping: Optional[Dict[Union[str, int], Any]]) -> Dict[int, Any]:
+        """{表头名称或列号: 值} 转换为 {1-based 列号: 值}，不存在的表头忽略"""
+        result = {}
+        for column, value in (mapping or {}).items():
+            for idx in self.resolve_columns(headers, [column]):
+                result[idx] = value
+        return result
+
+    @staticmethod
+    def _write_sheets(output, source, sources, sheet_name, rows, headers, formats, widths, header_font) -> int:
+        count = 0
+        for name in sources:
+            sheet = output.create_sheet(name)
+            if name != sheet_name:
+                # 其他工作表原样复制单元格值
+                for row in source[name].iter_rows(values_only=True):
+                    sheet.append(row)
+                continue
+
+            for idx, width in widths.items():
+                sheet.column_dimensions[get_column_letter(idx)].width = width
+            if headers is not None:
+                if header_font:
+                    header_cells = []
+                    for value in headers:
+                        cell = WriteOnlyCell(sheet, value=value)
+                        cell.font = header_font
+                        header_cells.append(cell)
+                    sheet.append(header_cells)
+                else:
+                    sheet.append(headers)
+            for row in rows:
+                if formats:
+                    row = list(row)
+                    for idx, fmt in formats.items():
+                        if idx <= len(row):
+                            cell = WriteOnlyCell(sheet, value=row[idx - 1])
+                            cell.number_format = fmt
+                            row[idx - 1] = cell
+                sheet.append(row)
+                count += 1
+        return count
+
+    def replace_file(self, write, file_path: Optional[Union[str, os.PathLike]] = None) -> None:
+        """
+        原子写文件：write(临时路径) 写入同目录下的临时文件，成功后用 os.replace 替换目标文件
+        :param file_path: 目标文件，默认为当前文件
+        """
+        file_path = Path(file_path) if file_path is not None else self.file_path
+        tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def filter_rows(
+            self,
+            sheet_name: str,
+            row_filter,
+            output_sheet: Optional[str] = None,
+            output_path: Optional[Union[str, os.PathLike]] = None,
+            chunk_rows: int = 5000
+    ) -> Dict[str, int]:
+        """
+        一次流式遍历完成筛选：逐行读取、分块求值、写出满足条件的行同时进行，内存占用与表大小无关
+        - 表头及以上的行原样保留；数据行整行写回（包括表头右侧没有列名的单元格）
+        - 默认覆写原工作表；指定 output_sheet 时写入本文件的该工作表，原表不变；
+          指定 output_path 时写入新文件（只含筛选结果，工作表名为 output_sheet 或原表名）
+        :param row_filter: RowFilter（modes.filter.filter_engine），条件按表头名称引用列，缺列时抛出 KeyError
+        :return: {"total": 数据行数, "matched": 保留行数, "removed": 剔除行数}
+        """
+        rows = self.iter_sheet_values(sheet_name)
+        leading_rows = [list(next(rows, None) or []) for _ in range(self.header_row)]
+        counts = {"total": 0, "matched": 0}
+
+        def counted(iterable, key):
+            for row in iterable:
+                counts[key] += 1
+                yield row
+
+        matched = row_filter.iter_matching_rows(chain([leading_rows[-1]], counted(rows, "total")), chunk_rows)
+        output_rows = chain(leading_rows, counted(matched, "matched"))
+        if output_path is not None:
+            output = openpyxl.Workbook(write_only=True)
+            sheet = output.create_sheet(output_sheet or sheet_name)
+            for row in output_rows:
+                sheet.append(row)
+            self.replace_file(output.save, output_path)
+        else:
+            self.write_sheet_rows(output_sheet or sheet_name, output_rows)
+        counts["removed"] = counts["total"] - counts["matched"]
+        return counts
 
     def write_range(
             self,
@@ -135,16 +530,20 @@ class ExcelTool:
     ) -> None:
         if start_row <= self.header_row:
             start_row = self.header_row + 1
-        for row_idx, row_data in enumerate(data, start=start_row):
-            for col_idx, value in enumerate(row_data, start=start_col):
-                sheet.cell(row=row_idx, column=col_idx).value = value
+        with self._lock:
+            for row_idx, row_data in enumerate(data, start=start_row):
+                for col_idx, value in enumerate(row_data, start=start_col):
+                    sheet.cell(row=row_idx, column=col_idx).value = value
+        self.mark_dirty(sheet)
 
     def set_column_width(self, sheet: openpyxl.worksheet.worksheet.Worksheet, column: int, width: float) -> None:
         column_letter = get_column_letter(column)
-        sheet.column_dimensions[column_letter].width = width
+        with self._lock:
+            sheet.column_dimensions[column_letter].width = width
 
     def set_row_height(self, sheet: openpyxl.worksheet.worksheet.Worksheet, row: int, height: float) -> None:
-        sheet.row_dimensions[row].height = height
+        with self._lock:
+            sheet.row_dimensions[row].height = height
 
     def apply_format_to_range(
             self,
@@ -157,13 +556,14 @@ class ExcelTool:
             alignment: Optional[Alignment] = None,
             fill: Optional[PatternFill] = None
     ) -> None:
-        for row in range(start_row, end_row + 1):
-            for col in range(start_col, end_col + 1):
-                cell = sheet.cell(row=row, column=col)
-                if font:
-                    cell.font = font
-                if alignment:
-                    cell.alignment = alignment
-                if fill:
-                    cell.fill = fill
+        with self._lock:
+            for row in range(start_row, end_row + 1):
+                for col in range(start_col, end_col + 1):
+                    cell = sheet.cell(row=row, column=col)
+                    if font:
+                        cell.font = font
+                    if alignment:
+                        cell.alignment = alignment
+                    if fill:
+                        cell.fill = fill
 
@@ -0,0 +1,98 @@
+# save_worker.py
+"""
+后台保存
+- 保存请求交给一个后台线程执行，不阻塞 UI
+- 同一文件尚未开始写入的多次保存请求合并为一次写入（写入时使用最新的内容）
+- 调用方需要确认已落盘时，可以等待返回的 Future，或调用 flush / flush_async
+- 程序正常退出前等待所有保存完成
+"""
+import os
+import atexit
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+from core.logger import logger
+
+
+class SaveWorker:
+    """按文件合并保存请求的后台写入线程"""
+
+    def __init__(self):
+        self._pending = {}   # {路径: (write, future)}，尚未开始写入
+        self._running = {}   # {路径: future}，正在写入
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.abspath(path)
+
+    def submit(self, path, write: Callable[[], None]) -> Future:
+        """
+        请求保存：同一文件已有排队中的请求时替换为本次的 write，调用方共享同一个 Future
+        :param write: 实际写入文件的函数，在后台线程中调用
+        :return: 写入完成（或失败）时结束的 Future
+        """
+        key = self._key(path)
+        with self._cond:
+            entry = self._pending.get(key)
+            future = entry[1] if entry else Future()
+            self._pending[key] = (write, future)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="excel-save-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 正在写入的文件先不处理它排队中的请求，保证同一文件的写入顺序
+                key = next((k for k in self._pending if k not in self._running), None)
+                if key is None:
+                    self._cond.wait()
+                    continue
+                write, future = self._pending.pop(key)
+                self._running[key] = future
+            try:
+                write()
+            except BaseException as ex:
+                logger.error(f"后台保存失败: {key} => {ex}")
+                future.set_exception(ex)
+            else:
+                future.set_result(key)
+            finally:
+                with self._cond:
+                    self._running.pop(key, None)
+                    self._cond.notify_all()
+
+    def is_pending(self, path=None) -> bool:
+        """是否有排队中或正在进行的保存（path 为 None 时检查所有文件）"""
+        with self._cond:
+            return self._busy(None if path is None else self._key(path))
+
+    def _busy(self, key) -> bool:
+        if key is None:
+            return bool(self._pending or self._running)
+        return key in self._pending or key in self._running
+
+    def flush(self, path=None, timeout: Optional[float] = None) -> bool:
+        """
+        等待保存全部完成（只等待 path 对应的文件，或所有文件）
+        :return: 是否在 timeout 内完成
+        """
+        key = None if path is None else self._key(path)
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy(key), timeout)
+
+    async def flush_async(self, path=None, timeout: Optional[float] = None) -> bool:
+        return await asyncio.to_thread(self.flush, path, timeout)
+
+
+# 全局后台保存实例
+save_worker = SaveWorker()
+# 正常退出时等待未完成的保存，避免丢失最后一次修改
+atexit.register(save_worker.flush)
@@ -0,0 +1,81 @@
+# workbook_cache.py
+"""
+工作簿缓存
+- 按文件路径缓存已加载的 openpyxl 工作簿，并记录加载 / 保存时文件的 mtime 与大小
+- 文件未变化时直接复用内存中的工作簿，只有检测到外部修改时才重新加载
+- 自己保存后更新记录，不会把自己的写入误判为外部修改
+- 没有加载工作簿的读写（流式读取、整表重建）也记录文件状态（工作簿为 None），之后的外部修改同样能被发现
+"""
+import os
+from collections import OrderedDict
+from threading import RLock
+
+
+def file_stat(path):
+    """(mtime_ns, size)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WorkbookCache:
+    """按路径缓存工作簿（LRU）"""
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max_size
+        self._entries = OrderedDict()   # {路径: (stat, workbook)}
+        self._lock = RLock()
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path, loader):
+        """
+        返回路径对应的工作簿：缓存命中且文件未变化时直接返回，否则调用 loader(path) 重新加载
+        """
+        key = self._key(path)
+        stat = file_stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat and entry[1] is not None:
+                self._entries.move_to_end(key)
+                return entry[1]
+        workbook = loader(path)
+        self.put(path, workbook, stat)
+        return workbook
+
+    def put(self, path, workbook, stat=None):
+        """记录工作簿与文件当前的状态（保存后调用）；workbook 为 None 时只记录文件状态"""
+        key = self._key(path)
+        with self._lock:
+            self._entries[key] = (stat or file_stat(path), workbook)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def remember(self, path):
+        """不加载工作簿直接读取文件时记录文件状态（已有记录时不覆盖，避免掩盖尚未处理的外部修改）"""
+        key = self._key(path)
+        with self._lock:
+            if key not in self._entries:
+                self.put(path, None)
+
+    def is_stale(self, path) -> bool:
+        """缓存的工作簿是否已与磁盘文件不一致（被外部程序修改或删除）"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+        return entry is not None and entry[0] != file_stat(path)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(path), None)
+
+
+# 全局缓存实例
+workbook_cache = WorkbookCache()
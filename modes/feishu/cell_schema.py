@@ -0,0 +1,193 @@
+# cell_schema.py
+"""
+飞书单元格的按列类型转换
+- 每张表用声明式 schema 按表头名称描述列类型：日期序列号、链接、数字、@人、文本
+- 转换按整列进行（pandas 列运算 / 整列 map），不在写入时逐个单元格判断
+- 同一个 schema 决定读取时的 valueRenderOption / dateTimeRenderOption，能由服务端完成的转换交给服务端
+"""
+from itertools import zip_longest, islice
+import numpy as np
+import pandas as pd
+
+DATE = "date"        # 日期序列号（1899-12-30 起的天数）→ yyyy-mm-dd
+LINK = "link"        # 超链接 [{"type": "url", "text": ..., "link": ...}] → URL
+NUMBER = "number"    # 数字或数字字符串 → 数字，无法解析的保留原值
+MENTION = "mention"  # @人 [{"type": "mention", "text": "@张三", ...}] → 文本
+TEXT = "text"        # 富文本片段拼接为文本，数字转为字符串（订单号等长数字不会被 Excel 显示为科学计数法）
+AUTO = "auto"        # 未声明的列：只展开富文本片段（链接取 URL），其他值不变
+
+DATE_FORMAT = "%Y-%m-%d"
+EXCEL_EPOCH = "1899-12-30"
+# 有效的日期序列号范围（不含端点），2958466 为 9999-12-31 的下一天，超出范围的数字保留原值
+DATE_SERIAL_MAX = 2958466
+
+
+def _segments_text(value):
+    """富文本片段（列表）拼接为文本，其他值原样返回"""
+    if isinstance(value, list):
+        return "".join(str(seg.get("text") or "") if isinstance(seg, dict) else str(seg) for seg in value)
+    return value
+
+
+def _segments_link(value):
+    """首个片段带 link 时取 URL，否则按文本拼接"""
+    if isinstance(value, list) and value and isinstance(value[0], dict) and value[0].get("link"):
+        return value[0]["link"]
+    return _segments_text(value)
+
+
+def _is_number(series: pd.Series) -> np.ndarray:
+    return series.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).to_numpy(dtype=bool)
+
+
+def _is_rich(series: pd.Series) -> np.ndarray:
+    return series.map(lambda v: isinstance(v, list)).to_numpy(dtype=bool)
+
+
+def convert_date(series: pd.Series) -> pd.Series:
+    """日期序列号转为 yyyy-mm-dd，已是字符串的值（服务端格式化过的日期）与超出范围的数字不变"""
+    result = series.copy()
+    numbers = _is_number(series) & series.map(
+        lambda v: isinstance(v, (int, float)) and 0 < v < DATE_SERIAL_MAX
+    ).to_numpy(dtype=bool)
+    if numbers.any():
+        dates = pd.to_datetime(series[numbers].astype(float), unit="D", origin=EXCEL_EPOCH, errors="coerce")
+        formatted = dates.dt.strftime(DATE_FORMAT)
+        valid = formatted.notna()
+        result.loc[formatted.index[valid]] = formatted[valid]
+    return result
+
+
+def convert_link(series: pd.Series) -> pd.Series:
+    rich = _is_rich(series)
+    if not rich.any():
+        return series
+    result = series.copy()
+    result[rich] = series[rich].map(_segments_link)
+    return result
+
+
+def convert_mention(series: pd.Series) -> pd.Series:
+    rich = _is_rich(series)
+    if not rich.any():
+        return series
+    result = series.copy()
+    result[rich] = series[rich].map(_segments_text)
+    return result
+
+
+def convert_number(series: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(series.map(_segments_text), errors="coerce")
+    parsed = numbers.notna().to_numpy()
+    result = series.copy()
+    if parsed.any():
+        # 整数值保持为 int，避免 1 被写成 1.0
+        values = numbers[parsed]
+        result[parsed] = [int(v) if float(v).is_integer() else float(v) for v in values]
+    return result
+
+
+def convert_text(series: pd.Series) -> pd.Series:
+    result = convert_mention(series)
+    others = (result.notna() & ~result.map(lambda v: isinstance(v, str))).to_numpy()
+    if others.any():
+        result = result.copy()
+        result[others] = result[others].map(
+            lambda v: str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+        )
+    return result
+
+
+CONVERTERS = {
+    DATE: convert_date,
+    LINK: convert_link,
+    NUMBER: convert_number,
+    MENTION: convert_mention,
+    TEXT: convert_text,
+    AUTO: convert_link,
+}
+
+
+class SheetSchema:
+    """
+    按表头名称声明的列类型
+    例：SheetSchema({"发货日期": DATE, "主页链接": LINK, "订单号": TEXT})
+    """
+
+    def __init__(self, columns: dict, default: str = AUTO):
+        unknown = {kind for kind in list(columns.values()) + [default] if kind not in CONVERTERS}
+        if unknown:
+            raise ValueError(f"未知的列类型: {unknown}")
+        self.columns = dict(columns)
+        self.default = default
+
+    def column_type(self, name) -> str:
+        return self.columns.get(str(name).strip() if name is not None else name, self.default)
+
+    def render_params(self, columns=None) -> dict:
+        """
+        读取这些列时的查询参数
+        - 不含链接列时用 ToString：富文本、@人直接返回文本（数字仍为数字）
+        - 含日期列时用 FormattedString：日期由服务端按单元格格式返回字符串
+        :param columns: 本次请求的列名，为 None 时按 schema 中的全部列
+        """
+        kinds = {self.column_type(name) for name in (columns if columns is not None else self.columns)}
+        params = {}
+        if not kinds & {LINK, AUTO}:
+            params["valueRenderOption"] = "ToString"
+        if DATE in kinds:
+            params["dateTimeRenderOption"] = "FormattedString"
+        return params
+
+    def convert_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """按列转换 DataFrame（返回新的 DataFrame）"""
+        return pd.DataFrame({
+            name: CONVERTERS[self.column_type(name)](frame[name]) for name in frame.columns
+        })
+
+    def convert_rows(self, rows, chunk_rows: int = 5000):
+        """
+        转换二维数组或逐行生成器（首行为表头，原样产出），按块转置后整列转换，内存占用与表大小无关
+        :return: 生成器，逐行产出转换后的列表
+        """
+        rows = iter(rows or [])
+        header = next(rows, None)
+        if header is None:
+            return
+        yield list(header)
+        converters = [CONVERTERS[self.column_type(name)] for name in header]
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return
+            columns = []
+            # zip_longest 会把短行补齐为 None，输出时截回原来的长度（空行仍为空行）
+            for idx, column in enumerate(zip_longest(*chunk)):
+                convert = converters[idx] if idx < len(converters) else CONVERTERS[self.default]
+                # fromiter 不会把富文本片段列表展开成二维
+                series = pd.Series(np.fromiter(column, dtype=object, count=len(chunk)), dtype=object)
+                columns.append(convert(series).tolist())
+            # 整块都是空行时没有列可转置
+            converted = zip(*columns) if columns else ([] for _ in chunk)
+            yield from (list(row[:len(orig)]) for row, orig in zip(converted, chunk))
+
+
+# 样品表（默认表头）的列类型
+SAMPLE_SHEET_SCHEMA = SheetSchema({
+    "序号": NUMBER,
+    "BD": MENTION,
+    "达人名称": TEXT,
+    "带货店铺": TEXT,
+    "样品名": TEXT,
+    "合作类型": TEXT,
+    "发样数量": NUMBER,
+    "性别": TEXT,
+    "粉丝量": NUMBER,
+    "主页链接": LINK,
+    "寄样批准日期": DATE,
+    "发货日期": DATE,
+    "订单号": TEXT,
+    "履约方式": TEXT,
+    "创作视频链接": LINK,
+    "视频码": TEXT,
+})
@@ -1,14 +1,14 @@
 # feishu_auth.py
-import requests
 import webbrowser
 import time
 from modes.feishu.localserver import last_code
+from modes.feishu.feishu_client import feishu_client, async_feishu_client
 from core.env import APP_ID, APP_SECRET, REDIRECT_URI
 
 def get_authorize_url(state="STATE"):
     return (
         f"https://accounts.feishu.cn/open-apis/authen/v1/authorize"
-        f"?client_id={APP_ID}&response_type=code&redirect_uri={REDIRECT_URI}&scope=docs:doc%20drive:drive%20sheets:spreadsheet%20contact:user.employee_id:readonly&state={state}"
+        f"?client_id={APP_ID}&response_type=code&redirect_uri={REDIRECT_URI}&scope=docs:doc%20drive:drive%20sheets:spreadsheet%20contact:user.employee_id:readonly%20offline_access&state={state}"
     )
 
 def wait_for_code(timeout=120):
@@ -19,23 +19,55 @@ def wait_for_code(timeout=120):
         time.sleep(1)
     raise TimeoutError("授权超时")
 
-def exchange_code_for_token(code):
-    url = "https://open.feishu.cn/open-apis/authen/v2/oauth/token"
-    payload = {
+def code_payload(code):
+    return {
         "grant_type": "authorization_code",
         "client_id": APP_ID,
         "client_secret": APP_SECRET,
         "code": code,
         "redirect_uri": REDIRECT_URI
     }
-    resp = requests.post(url, json=payload)
+
+def refresh_payload(refresh_token):
+    return {
+        "grant_type": "refresh_token",
+        "client_id": APP_ID,
+        "client_secret": APP_SECRET,
+        "refresh_token": refresh_token
+    }
+
+def request_token(payload):
+    """
+    调用 oauth/token 接口
+    :return: 完整响应数据，含 access_token、expires_in、refresh_token、refresh_token_expires_in
+    """
+    resp = feishu_client.post("authen/v2/oauth/token", json=payload, auth=False)
+    return _parse_token_response(resp)
+
+async def request_token_async(payload):
+    """request_token 的异步版本，不阻塞事件循环"""
+    resp = await async_feishu_client.post("authen/v2/oauth/token", json=payload, auth=False)
+    return _parse_token_response(resp)
+
+def exchange_code_for_token(code):
+    data = request_token(code_payload(code))
+    return data["access_token"], data["expires_in"]
+
+async def exchange_code_for_token_async(code):
+    """exchange_code_for_token 的异步版本，不阻塞事件循环"""
+    data = await request_token_async(code_payload(code))
+    return data["access_token"], data["expires_in"]
+
+def refresh_access_token(refresh_token):
+    """用 refresh_token 换取新的 user_access_token（refresh_token 同时轮换）"""
+    return request_token(refresh_payload(refresh_token))
+
+def _parse_token_response(resp):
     if resp.status_code == 200:
         data = resp.json()
         if data.get("code") == 0:
             print("成功获取 user_access_token！")
-            print(data)
-
-            return data["access_token"], data["expires_in"]
+            return data
         else:
             raise Exception(f"Feishu error: {data}")
     else:
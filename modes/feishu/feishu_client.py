@@ -0,0 +1,349 @@
+# feishu_client.py
+"""
+飞书 Open API 客户端
+- 所有模块共享同一个连接池（keep-alive），避免每次请求都重新进行 TCP+TLS 握手
+- 统一的超时设置
+- 自动注入 Authorization 请求头
+- 按接口分组的客户端限流，频控与 5xx 时按指数退避（带抖动）自动重试
+- 同步客户端基于 requests，异步客户端基于 httpx，供 Flet 事件循环中的异步任务使用
+- 并发的相同 GET 请求合并为一次，成功结果短时缓存
+"""
+import re
+import time
+import random
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from core.env import FEISHU_BASE_URL, FEISHU_POOL_SIZE, FEISHU_CONNECT_TIMEOUT, FEISHU_READ_TIMEOUT, \
+    FEISHU_MAX_RETRIES
+from core.logger import logger
+from modes.feishu.rate_limiter import RateLimiter
+from modes.feishu.single_flight import request_key, ResponseCache, SingleFlight, AsyncSingleFlight, LeaderCancelled
+
+# 飞书频控错误码：99991400 应用/租户频率限制，90217 表格接口请求过于频繁
+THROTTLE_CODES = (99991400, 90217)
+_THROTTLE_RE = re.compile(rb'"code"\s*:\s*(' + b"|".join(str(c).encode() for c in THROTTLE_CODES) + rb')\b')
+# access_token 失效 / 过期错误码：刷新令牌后重试一次
+TOKEN_EXPIRED_CODES = (99991677, 99991668, 99991663)
+_TOKEN_EXPIRED_RE = re.compile(rb'"code"\s*:\s*(' + b"|".join(str(c).encode() for c in TOKEN_EXPIRED_CODES) + rb')\b')
+_SUCCESS_RE = re.compile(rb'"code"\s*:\s*0\b')
+# 可安全重试 5xx 的方法（POST 如 values_append 重试可能导致重复写入）
+IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+
+
+def is_throttled(resp: requests.Response) -> bool:
+    """判断响应是否为频控错误"""
+    if resp.status_code == 429:
+        return True
+    # 响应体中 code 字段位于开头，只检查前一小段，避免为大响应重复解析 JSON
+    return bool(_THROTTLE_RE.search(resp.content[:128]))
+
+
+def is_token_expired(resp) -> bool:
+    """判断响应是否为 access_token 失效"""
+    return bool(_TOKEN_EXPIRED_RE.search(resp.content[:128]))
+
+
+def is_success(resp) -> bool:
+    """判断响应是否成功（HTTP 200 且业务 code 为 0），只有成功的响应才会被缓存"""
+    return resp.status_code == 200 and bool(_SUCCESS_RE.search(resp.content[:128]))
+
+
+class BaseFeishuClient:
+    """同步 / 异步客户端共用的配置、鉴权与重试策略"""
+
+    def __init__(
+            self,
+            base_url: str = FEISHU_BASE_URL,
+            pool_size: int = FEISHU_POOL_SIZE,
+            connect_timeout: float = FEISHU_CONNECT_TIMEOUT,
+            read_timeout: float = FEISHU_READ_TIMEOUT,
+            max_retries: int = FEISHU_MAX_RETRIES,
+            rate_limiter: RateLimiter = None,
+            read_cache: ResponseCache = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = 0.5
+        self.backoff_max = 30.0
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.read_cache = read_cache or ResponseCache()
+        self.access_token = None
+        self.token_manager = None
+
+    def set_access_token(self, access_token):
+        """设置默认的 user_access_token，未显式传入 token 的请求都会使用它"""
+        self.access_token = access_token
+
+    def set_token_manager(self, token_manager):
+        """
+        设置令牌管理器
+        设置后所有请求都使用其提供的最新 token（忽略调用方传入的 token），
+        长时间的批量任务中途不会因为 token 过期而失败
+        """
+        self.token_manager = token_manager
+
+    def build_url(self, path: str) -> str:
+        """相对路径拼接到 base_url，完整 URL 原样返回"""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def relative_path(self, path: str) -> str:
+        """完整 URL 转换为相对 base_url 的路径，用于匹配限流分组"""
+        if path.startswith(self.base_url):
+            path = path[len(self.base_url):]
+        return path.lstrip("/")
+
+    def build_headers(self, headers=None, access_token=None, auth: bool = True) -> dict:
+        """合并请求头并注入 Authorization"""
+        headers = dict(headers or {})
+        token = access_token or self.access_token
+        if auth and token:
+            headers.setdefault("Authorization", f"Bearer {token}")
+        return headers
+
+    @staticmethod
+    def coalescible(method: str, auth: bool, coalesce: bool) -> bool:
+        """只合并 / 缓存带鉴权的 GET 请求"""
+        return coalesce and auth and method.upper() == "GET"
+
+    def after_write(self, method: str, auth: bool):
+        """写请求后清空读缓存，之后的读取一定能看到本次写入"""
+        if auth and method.upper() != "GET":
+            self.read_cache.clear()
+
+    def should_refresh_token(self, auth: bool, resp, refreshed: bool) -> bool:
+        """token 失效且尚未刷新过时，需要刷新令牌后重试"""
+        return auth and not refreshed and self.token_manager is not None and is_token_expired(resp)
+
+    def backoff_delay(self, attempt: int, resp=None) -> float:
+        """第 attempt 次重试前的等待时间：优先使用服务端返回的重置时间，否则为带抖动的指数退避"""
+        if resp is not None:
+            reset = resp.headers.get("Retry-After") or resp.headers.get("x-ogw-ratelimit-reset")
+            if reset:
+                try:
+                    return min(float(reset), self.backoff_max) + random.uniform(0, self.backoff_base)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def should_retry(self, method: str, resp) -> bool:
+        """判断响应是否需要重试：频控总是重试，5xx 只对幂等方法重试"""
+        if is_throttled(resp):
+            return True
+        return resp.status_code >= 500 and method.upper() in IDEMPOTENT_METHODS
+
+    def after_response(self, bucket, method: str, path: str, resp, attempt: int):
+        """
+        处理一次响应，更新限流预算
+        :return: 需要重试时返回等待秒数，否则返回 None
+        """
+        if not self.should_retry(method, resp):
+            bucket.on_success()
+            return None
+        if is_throttled(resp):
+            bucket.on_throttled()
+        if attempt >= self.max_retries:
+            logger.error(f"飞书接口重试 {attempt} 次后仍失败: {method} {path} => HTTP {resp.status_code}")
+            return None
+        delay = self.backoff_delay(attempt, resp)
+        logger.warning(f"飞书接口限流或服务异常，{delay:.1f}s 后重试: {method} {path} => HTTP {resp.status_code}")
+        return delay
+
+
+class FeishuClient(BaseFeishuClient):
+    """飞书 API 客户端（同步）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = self._create_session()
+        self.single_flight = SingleFlight()
+
+    def _create_session(self) -> requests.Session:
+        """创建带连接池的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Content-Type": "application/json; charset=utf-8"})
+        return session
+
+    def request(self, method: str, path: str, access_token=None, auth: bool = True, coalesce: bool = True,
+                **kwargs) -> requests.Response:
+        """
+        发送请求，频控和 5xx 时自动退避重试；重试次数用尽后返回最后一次响应
+        :param method: HTTP 方法
+        :param path: 相对 base_url 的路径，如 sheets/v3/spreadsheets/{token}/sheets/query
+        :param access_token: 本次请求使用的 token，为空时使用默认 token
+        :param auth: 是否注入 Authorization 请求头
+        :param coalesce: GET 请求是否与相同的并发请求合并并使用短时缓存
+        """
+        if auth and self.token_manager is not None:
+            access_token = self.token_manager.get_token()
+        if not self.coalescible(method, auth, coalesce):
+            resp = self._send(method, path, access_token, auth, **kwargs)
+            self.after_write(method, auth)
+            return resp
+
+        key = request_key(self.build_url(path), kwargs.get("params"), access_token or self.access_token)
+        cached = self.read_cache.get(key)
+        if cached is not None:
+            return cached
+        future, leader = self.single_flight.join(key)
+        if not leader:
+            return future.result()
+        try:
+            resp = self._send(method, path, access_token, auth, **kwargs)
+            if is_success(resp):
+                self.read_cache.put(key, resp)
+            future.set_result(resp)
+            return resp
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.single_flight.leave(key)
+
+    def _send(self, method: str, path: str, access_token, auth: bool, **kwargs) -> requests.Response:
+        """实际发送请求（限流、退避重试与令牌刷新）"""
+        headers = self.build_headers(kwargs.pop("headers", None), access_token, auth)
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.build_url(path)
+        bucket = self.rate_limiter.bucket_for(method, self.relative_path(path))
+
+        attempt = 0
+        refreshed = False
+        while True:
+            bucket.acquire()
+            resp = self.session.request(method, url, headers=headers, **kwargs)
+            if self.should_refresh_token(auth, resp, refreshed):
+                refreshed = True
+                if self.token_manager.refresh(force=True, stale_token=access_token):
+                    headers["Authorization"] = f"Bearer {self.token_manager.access_token}"
+                    continue
+            delay = self.after_response(bucket, method, path, resp, attempt)
+            if delay is None:
+                return resp
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncFeishuClient(BaseFeishuClient):
+    """
+    飞书 API 客户端（异步）
+    httpx.AsyncClient 绑定事件循环，因此在首次请求时于当前循环中创建
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = None
+        self.single_flight = AsyncSingleFlight()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            connect_timeout, read_timeout = self.timeout
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                headers={"Content-Type": "application/json; charset=utf-8"},
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, access_token=None, auth: bool = True, coalesce: bool = True,
+                      **kwargs) -> httpx.Response:
+        """异步发送请求，参数与 FeishuClient.request 一致"""
+        if auth and self.token_manager is not None:
+            access_token = await self.token_manager.get_token_async()
+        if not self.coalescible(method, auth, coalesce):
+            resp = await self._send(method, path, access_token, auth, **kwargs)
+            self.after_write(method, auth)
+            return resp
+
+        key = request_key(self.build_url(path), kwargs.get("params"), access_token or self.access_token)
+        cached = self.read_cache.get(key)
+        if cached is not None:
+            return cached
+        while True:
+            future, leader = self.single_flight.join(key)
+            if leader:
+                break
+            try:
+                return await asyncio.shield(future)
+            except LeaderCancelled:
+                # 发送请求的调用方被取消，重新加入（可能成为新的发送方）
+                continue
+        try:
+            resp = await self._send(method, path, access_token, auth, **kwargs)
+            if is_success(resp):
+                self.read_cache.put(key, resp)
+            future.set_result(resp)
+            return resp
+        except asyncio.CancelledError:
+            # 不取消共享的 Future，否则等待中的跟随者也会收到 CancelledError
+            future.set_exception(LeaderCancelled(key))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.single_flight.leave(key, future)
+
+    async def _send(self, method: str, path: str, access_token, auth: bool, **kwargs) -> httpx.Response:
+        """实际发送请求（限流、退避重试与令牌刷新）"""
+        headers = self.build_headers(kwargs.pop("headers", None), access_token, auth)
+        url = self.build_url(path)
+        bucket = self.rate_limiter.bucket_for(method, self.relative_path(path))
+        client = self._get_client()
+
+        attempt = 0
+        refreshed = False
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            resp = await client.request(method, url, headers=headers, **kwargs)
+            if self.should_refresh_token(auth, resp, refreshed):
+                refreshed = True
+                if await asyncio.to_thread(self.token_manager.refresh, True, access_token):
+                    headers["Authorization"] = f"Bearer {self.token_manager.access_token}"
+                    continue
+            delay = self.after_response(bucket, method, path, resp, attempt)
+            if delay is None:
+                return resp
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 全局客户端实例（同步与异步客户端共享同一套限流预算与读缓存）
+feishu_client = FeishuClient()
+async_feishu_client = AsyncFeishuClient(rate_limiter=feishu_client.rate_limiter, read_cache=feishu_client.read_cache)
@@ -3,7 +3,7 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import pandas as pd
 from feishu_auth import start_authorize_flow, exchange_code_for_token
-from feishu_sheet import append_to_sheet, col_num_to_letter
+from feishu_sheet import bulk_append_to_sheet, col_num_to_letter
 
 class FeishuApp:
     def __init__(self, root):
@@ -42,6 +42,12 @@ class FeishuApp:
             # 1 秒后再次检查
             self.root.after(1000, self.check_authorization)
 
+    def on_upload_progress(self, confirmed_chunks, total_chunks, confirmed_rows):
+        """分块上传进度"""
+        print(f"📘 上传进度: {confirmed_chunks}/{total_chunks} 块，{confirmed_rows} 行")
+        self.status_label.config(text=f"状态：上传中 {confirmed_chunks}/{total_chunks}", fg="blue")
+        self.root.update_idletasks()
+
     def select_excel(self):
         if not self.access_token:
             messagebox.showwarning("警告", "请先完成飞书授权！")
@@ -82,11 +88,25 @@ class FeishuApp:
             print(f"📘 上传范围: {range_ref}")
             print(f"📘 上传数据预览（前2行）: {values[:2]}")
 
-            success = append_to_sheet(self.access_token, spreadsheet_token, range_ref, values)
-            if success:
-                messagebox.showinfo("完成", f"成功追加到飞书云文档！\n范围：{range_ref}")
-            else:
-                messagebox.showerror("失败", "上传失败，请检查控制台输出。")
+            # 分块追加上传（写在已有数据之后，不覆盖），失败后可从最后确认的分块继续
+            start_chunk, append_row = 0, None
+            while True:
+                result = bulk_append_to_sheet(
+                    self.access_token, spreadsheet_token, range_ref, values,
+                    start_chunk=start_chunk, append_row=append_row, on_progress=self.on_upload_progress
+                )
+                if result["success"]:
+                    messagebox.showinfo("完成", f"成功上传到飞书云文档！\n范围：{range_ref}")
+                    break
+                retry = messagebox.askyesno(
+                    "失败",
+                    f"上传失败：{result['error']}\n"
+                    f"已确认 {result['confirmed_chunks']}/{result['total_chunks']} 块"
+                    f"（{result['confirmed_rows']} 行），是否从断点继续上传？"
+                )
+                if not retry:
+                    break
+                start_chunk, append_row = result["confirmed_chunks"], result["append_row"]
 
         except Exception as e:
             messagebox.showerror("错误", f"处理表格时出错：\n{e}")
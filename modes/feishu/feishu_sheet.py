@@ -1,5 +1,11 @@
 # feishu_sheet.py
-import requests
+import re
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modes.feishu.feishu_client import feishu_client, async_feishu_client
+from modes.feishu.fast_decode import decode_value_ranges
+from core.env import FEISHU_MAX_WORKERS
 
 
 def col_num_to_letter(n):
@@ -18,11 +24,7 @@ def append_to_sheet(access_token, spreadsheet_token, range_ref, values):
     :param sheet_id: 目标 sheet id
     :param values: 二维数组数据 [[A1, B1], [A2, B2]]
     """
-    url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values_append"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values_append"
     payload = {
         "valueRange": {
             "range": range_ref,
@@ -30,7 +32,7 @@ def append_to_sheet(access_token, spreadsheet_token, range_ref, values):
         }
     }
 
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = feishu_client.post(path, access_token=access_token, json=payload)
     data = resp.json()
     if data.get("code") == 0:
         print("✅ 数据追加成功！")
@@ -39,3 +41,554 @@ def append_to_sheet(access_token, spreadsheet_token, range_ref, values):
         print("❌ 追加失败：", data)
         print("响应内容:", data)
         return False
+
+
+# values 写入接口单次请求的限制
+WRITE_MAX_ROWS = 5000
+WRITE_MAX_COLUMNS = 100
+WRITE_MAX_BYTES = 8 * 1024 * 1024   # 官方上限 10MB，预留余量
+
+
+def write_to_sheet(access_token, spreadsheet_token, range_ref, values):
+    """
+    向指定范围写入数据（覆盖写），失败时抛出异常
+    :param range_ref: 形如 sheetId!A2:R100 的范围
+    :param values: 二维数组数据
+    """
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values"
+    payload = {
+        "valueRange": {
+            "range": range_ref,
+            "values": values
+        }
+    }
+    resp = feishu_client.put(path, access_token=access_token, json=payload)
+    data = resp.json()
+    if data.get("code") != 0:
+        raise Exception(data.get("msg"))
+    return data.get("data")
+
+
+def split_write_chunks(values, max_rows=WRITE_MAX_ROWS, max_bytes=WRITE_MAX_BYTES):
+    """
+    按行数和预估的请求体大小切分待写入的数据
+    :return: [(起始行偏移, 行列表), ...]
+    """
+    chunks = []
+    start, size = 0, 0
+    for idx, row in enumerate(values):
+        row_bytes = len(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+        if idx > start and (idx - start >= max_rows or size + row_bytes > max_bytes):
+            chunks.append((start, values[start:idx]))
+            start, size = idx, 0
+        size += row_bytes
+    if start < len(values):
+        chunks.append((start, values[start:]))
+    return chunks
+
+
+def _plan_bulk_write(range_ref, values, chunk_rows, start_chunk):
+    """
+    分块写入的公共准备：解析起始单元格、校验列数、切分分块
+    :return: (plan, result)；plan 为 {"sheet_id", "start_col", "start_row", "end_col", "chunks"}
+    """
+    sheet_id, _, cells = range_ref.partition("!")
+    match = _CELL_RE.match(cells.split(":")[0])
+    if not sheet_id or not match:
+        raise ValueError(f"范围格式错误，应形如 sheetId!A2：{range_ref}")
+
+    width = max((len(row) for row in values), default=0)
+    if width > WRITE_MAX_COLUMNS:
+        raise ValueError(f"单次写入最多 {WRITE_MAX_COLUMNS} 列，当前 {width} 列")
+
+    chunks = split_write_chunks(values, max_rows=chunk_rows)
+    total = len(chunks)
+    plan = {
+        "sheet_id": sheet_id,
+        "start_col": match.group(1).upper(),
+        "start_row": int(match.group(2)),
+        "end_col": col_num_to_letter(col_letter_to_num(match.group(1)) + max(width, 1) - 1),
+        "chunks": chunks,
+    }
+    result = {
+        "success": True,
+        "total_chunks": total,
+        "confirmed_chunks": start_chunk,
+        "confirmed_rows": chunks[start_chunk][0] if start_chunk < total else len(values),
+        "error": None,
+    }
+    return plan, result
+
+
+def _chunk_range(plan, first_row, rows):
+    return f"{plan['sheet_id']}!{plan['start_col']}{first_row}:{plan['end_col']}{first_row + len(rows) - 1}"
+
+
+def _confirm(plan, result, done, total_rows, on_progress):
+    """只有前面的分块全部成功，才算确认"""
+    while result["confirmed_chunks"] in done:
+        result["confirmed_chunks"] += 1
+    confirmed = result["confirmed_chunks"]
+    result["confirmed_rows"] = plan["chunks"][confirmed][0] if confirmed < len(plan["chunks"]) else total_rows
+    if on_progress:
+        on_progress(confirmed, len(plan["chunks"]), result["confirmed_rows"])
+
+
+def _put_chunks(access_token, spreadsheet_token, plan, result, first_row, chunk_indices, total_rows,
+                max_in_flight, on_progress, done=None):
+    """
+    把分块并发写入明确的行范围（values 覆盖写），分块 i 写在 first_row + 行偏移 处
+    多个分块同时在途也不会打乱行顺序；失败时取消尚未开始的分块并把错误写入 result
+    """
+    done = set(done or ())
+
+    def write_chunk(idx):
+        offset, rows = plan["chunks"][idx]
+        write_to_sheet(access_token, spreadsheet_token, _chunk_range(plan, first_row + offset, rows), rows)
+
+    with ThreadPoolExecutor(max_workers=max(max_in_flight, 1)) as executor:
+        futures = {executor.submit(write_chunk, idx): idx for idx in chunk_indices}
+        try:
+            for future in as_completed(futures):
+                future.result()
+                done.add(futures[future])
+                _confirm(plan, result, done, total_rows, on_progress)
+        except Exception as e:
+            for pending in futures:
+                pending.cancel()
+            result["success"] = False
+            result["error"] = str(e)
+            print(f"❌ 分块写入失败（已确认 {result['confirmed_chunks']}/{result['total_chunks']} 块）：{e}")
+    return result
+
+
+def bulk_write_to_sheet(access_token, spreadsheet_token, range_ref, values,
+                        chunk_rows=WRITE_MAX_ROWS, max_in_flight=FEISHU_MAX_WORKERS, start_chunk=0, on_progress=None):
+    """
+    分块并发写入大批量数据（覆盖写）
+    每个分块写入明确的行范围，因此多个分块同时在途也不会打乱行顺序；范围内已有的数据会被覆盖，
+    需要保留已有数据时使用 bulk_append_to_sheet
+    :param range_ref: 起始位置，形如 sheetId!A2 或 sheetId!A2:R100（只使用起始单元格）
+    :param values: 二维数组数据
+    :param chunk_rows: 每个分块的最大行数
+    :param max_in_flight: 同时在途的分块数
+    :param start_chunk: 从第几个分块开始写入，用于失败后断点续传
+    :param on_progress: 进度回调 on_progress(已确认分块数, 总分块数, 已确认行数)
+    :return: {"success", "total_chunks", "confirmed_chunks", "confirmed_rows", "error"}
+             失败后以 confirmed_chunks 作为 start_chunk 重新调用即可续传
+    """
+    plan, result = _plan_bulk_write(range_ref, values, chunk_rows, start_chunk)
+    return _put_chunks(access_token, spreadsheet_token, plan, result, plan["start_row"],
+                       range(start_chunk, result["total_chunks"]), len(values), max_in_flight, on_progress)
+
+
+def append_values(access_token, spreadsheet_token, range_ref, values):
+    """
+    追加写入（values_append）：数据写在范围内已有数据之后的空行，不覆盖已有内容，失败时抛出异常
+    """
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values_append"
+    payload = {
+        "valueRange": {
+            "range": range_ref,
+            "values": values
+        }
+    }
+    resp = feishu_client.post(path, access_token=access_token, json=payload)
+    data = resp.json()
+    if data.get("code") != 0:
+        raise Exception(data.get("msg"))
+    return data.get("data")
+
+
+def _updated_first_row(data):
+    """values_append 响应中实际写入范围的起始行"""
+    updated_range = ((data or {}).get("updates") or {}).get("updatedRange") or ""
+    match = _CELL_RE.match(updated_range.partition("!")[2].split(":")[0])
+    if not match:
+        raise Exception(f"无法解析追加写入的范围：{updated_range}")
+    return int(match.group(2))
+
+
+def bulk_append_to_sheet(access_token, spreadsheet_token, range_ref, values,
+                         chunk_rows=WRITE_MAX_ROWS, max_in_flight=FEISHU_MAX_WORKERS, start_chunk=0,
+                         append_row=None, on_progress=None):
+    """
+    分块追加大批量数据，与 append_to_sheet 一样写在已有数据之后，不会覆盖表中已有的行
+    第一个分块用 values_append 追加，由服务端确定已有数据之后的起始行；其余分块按该行号换算出明确的范围，
+    与 bulk_write_to_sheet 一样并发写入
+    :param append_row: 数据首行所在的行号（上次调用返回的 append_row），续传时传入，所有分块直接按行号写入
+    其余参数同 bulk_write_to_sheet
+    :return: bulk_write_to_sheet 的返回值，另含 append_row；失败后以 confirmed_chunks 作为 start_chunk、
+             连同 append_row 重新调用即可续传（已并发写入但未确认的分块会被原位覆盖，不会重复追加）
+    """
+    plan, result = _plan_bulk_write(range_ref, values, chunk_rows, start_chunk)
+    result["append_row"] = append_row
+    total = result["total_chunks"]
+    if start_chunk >= total:
+        return result
+
+    done = set()
+    if append_row is None:
+        offset, rows = plan["chunks"][start_chunk]
+        try:
+            data = append_values(access_token, spreadsheet_token,
+                                 _chunk_range(plan, plan["start_row"], rows), rows)
+            result["append_row"] = _updated_first_row(data) - offset
+        except Exception as e:
+            result["success"] = False
+            result["error"] = str(e)
+            print(f"❌ 分块追加失败（已确认 {result['confirmed_chunks']}/{total} 块）：{e}")
+            return result
+        done.add(start_chunk)
+        _confirm(plan, result, done, len(values), on_progress)
+        start_chunk += 1
+
+    return _put_chunks(access_token, spreadsheet_token, plan, result, result["append_row"],
+                       range(start_chunk, total), len(values), max_in_flight, on_progress, done)
+
+
+# values_batch_get 单次请求的限制（超出时自动拆分为多个请求）
+BATCH_MAX_RANGES = 100          # 单次请求的范围个数
+BATCH_MAX_CELLS = 100_000       # 单次请求的预估单元格数，避免响应超过 10MB
+BATCH_MAX_QUERY_LENGTH = 1800   # ranges 查询参数长度，避免 URL 过长
+
+_CELL_RE = re.compile(r"^([A-Za-z]+)(\d+)$")
+
+
+def col_letter_to_num(letters):
+    """将Excel列字母转换为列号（A→1, AA→27）"""
+    result = 0
+    for ch in letters.upper():
+        result = result * 26 + (ord(ch) - 64)
+    return result
+
+
+def estimate_range_cells(range_ref):
+    """
+    估算范围内的单元格数量
+    :param range_ref: 形如 sheetId!A1:R500 的范围
+    :return: 单元格数量，无法解析时返回 0
+    """
+    cells = range_ref.split("!", 1)[-1].split(":")
+    if len(cells) != 2:
+        return 0
+    start, end = _CELL_RE.match(cells[0]), _CELL_RE.match(cells[1])
+    if not start or not end:
+        return 0
+    rows = int(end.group(2)) - int(start.group(2)) + 1
+    cols = col_letter_to_num(end.group(1)) - col_letter_to_num(start.group(1)) + 1
+    return max(rows, 0) * max(cols, 0)
+
+
+def split_batches(ranges):
+    """
+    按请求大小限制把范围列表切分为多个批次
+    :param ranges: 范围字符串列表
+    :return: 批次列表，每个批次为范围在 ranges 中的下标列表
+    """
+    batches = []
+    current, cells, length = [], 0, 0
+    for idx, range_ref in enumerate(ranges):
+        range_cells = estimate_range_cells(range_ref)
+        range_length = len(range_ref) + 1
+        if current and (
+                len(current) >= BATCH_MAX_RANGES
+                or cells + range_cells > BATCH_MAX_CELLS
+                or length + range_length > BATCH_MAX_QUERY_LENGTH
+        ):
+            batches.append(current)
+            current, cells, length = [], 0, 0
+        current.append(idx)
+        cells += range_cells
+        length += range_length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_spreadsheet_revision(access_token, spreadsheet_token):
+    """获取表格当前的版本号（表格内任意内容变化都会使版本号增加）"""
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/metainfo"
+    resp = feishu_client.get(path, access_token=access_token)
+    return _parse_revision(resp.json())
+
+
+async def get_spreadsheet_revision_async(access_token, spreadsheet_token):
+    """get_spreadsheet_revision 的异步版本"""
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/metainfo"
+    resp = await async_feishu_client.get(path, access_token=access_token)
+    return _parse_revision(resp.json())
+
+
+def _parse_revision(data):
+    if data.get("code") != 0:
+        raise Exception(data.get("msg"))
+    return data.get("data").get("properties").get("revision")
+
+
+def values_batch_get(access_token, spreadsheet_token, ranges, params=None):
+    """
+    一次请求读取同一表格中的多个范围
+    :param ranges: 范围字符串列表，如 ["sheetId!A1:R500", ...]
+    :param params: 额外的查询参数（如 valueRenderOption）
+    :return: 与 ranges 顺序一致的二维数组列表（响应体由 fast_decode 解析，安装了 orjson 时用 orjson）
+    """
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_get"
+    resp = feishu_client.get(path, access_token=access_token, params=_batch_query(ranges, params))
+    return decode_value_ranges(resp.content)
+
+
+async def values_batch_get_async(access_token, spreadsheet_token, ranges, params=None):
+    """values_batch_get 的异步版本"""
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_get"
+    resp = await async_feishu_client.get(path, access_token=access_token, params=_batch_query(ranges, params))
+    return decode_value_ranges(resp.content)
+
+
+def _batch_query(ranges, params=None):
+    query = {"ranges": ",".join(ranges)}
+    if params:
+        query.update(params)
+    return query
+
+
+def plan_batch_jobs(items):
+    """
+    按表格 token 分组（保持原始顺序）并按请求大小限制切分
+    :return: [(spreadsheet_token, 各范围在 items 中的下标, 范围列表), ...]
+    """
+    groups = {}
+    for idx, (spreadsheet_token, sheet_id, range_ref) in enumerate(items):
+        full_range = range_ref if "!" in range_ref else f"{sheet_id}!{range_ref}"
+        groups.setdefault(spreadsheet_token, []).append((idx, full_range))
+
+    jobs = []
+    for spreadsheet_token, entries in groups.items():
+        ranges = [full_range for _, full_range in entries]
+        for batch in split_batches(ranges):
+            jobs.append((spreadsheet_token, [entries[i][0] for i in batch], [ranges[i] for i in batch]))
+    return jobs
+
+
+def batch_get_values(access_token, items, max_workers=1, params=None):
+    """
+    批量读取多个表格 / 多个表的数据，尽量合并为最少的请求
+    :param items: [(spreadsheet_token, sheet_id, range), ...]，range 可带或不带 sheetId! 前缀
+    :param max_workers: 并发请求的批次数
+    :param params: 额外的查询参数
+    :return: 与 items 顺序一致的结果列表，单项为二维数组；所在批次失败时为对应的 Exception
+    """
+    results = [None] * len(items)
+    jobs = plan_batch_jobs(items)
+
+    def run(job):
+        spreadsheet_token, indices, batch_ranges = job
+        try:
+            batch_values = values_batch_get(access_token, spreadsheet_token, batch_ranges, params)
+            for idx, values in zip(indices, batch_values):
+                results[idx] = values
+        except Exception as e:
+            for idx in indices:
+                results[idx] = e
+
+    if max_workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(run, jobs))
+    else:
+        for job in jobs:
+            run(job)
+    return results
+
+
+async def batch_get_values_async(access_token, items, max_concurrency=1, params=None):
+    """batch_get_values 的异步版本，最多 max_concurrency 个批次同时在途"""
+    results = [None] * len(items)
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def run(job):
+        spreadsheet_token, indices, batch_ranges = job
+        async with semaphore:
+            try:
+                batch_values = await values_batch_get_async(access_token, spreadsheet_token, batch_ranges, params)
+                for idx, values in zip(indices, batch_values):
+                    results[idx] = values
+            except Exception as e:
+                for idx in indices:
+                    results[idx] = e
+
+    await asyncio.gather(*(run(job) for job in plan_batch_jobs(items)))
+    return results
+
+
+def resolve_columns(header, names):
+    """
+    将表头名称解析为列字母
+    :param header: 表头行
+    :param names: 需要的列名
+    :return: {列名: 列字母}，表头中不存在的列名不会出现在结果中
+    """
+    positions = {}
+    for idx, title in enumerate(header or [], start=1):
+        if title not in positions:
+            positions[title] = idx
+    return {name: col_num_to_letter(positions[name]) for name in names if name in positions}
+
+
+def projected_ranges(sheet_id, column_letters, header_row, row_count):
+    """
+    为需要的列生成读取范围，相邻的列合并为一个范围
+    :return: [(范围字符串, 范围内的列字母列表), ...]
+    """
+    nums = sorted({col_letter_to_num(letter) for letter in column_letters})
+    runs = []
+    for num in nums:
+        if runs and num == runs[-1][-1] + 1:
+            runs[-1].append(num)
+        else:
+            runs.append([num])
+    return [
+        (
+            f"{sheet_id}!{col_num_to_letter(run[0])}{header_row}:{col_num_to_letter(run[-1])}{row_count}",
+            [col_num_to_letter(num) for num in run],
+        )
+        for run in runs
+    ]
+
+
+def batch_get_projected(access_token, items, columns, header_row=1, max_workers=1, params=None):
+    """
+    列投影读取：先读表头，再只下载需要的列
+    :param items: [(spreadsheet_token, sheet_id, row_count, column_count), ...]
+    :param columns: 需要的列名，如 ["序号", "履约方式", "订单号"]
+    :return: 与 items 顺序一致的结果列表；单项为二维数组（首行为找到的列名，按 columns 顺序），
+             失败时为对应的 Exception
+    """
+    results = [None] * len(items)
+
+    # 1. 一次批量请求读取所有表的表头
+    headers = batch_get_values(access_token, projection_header_items(items, header_row),
+                               max_workers=max_workers, params=params)
+
+    # 2. 解析列字母，生成需要的列范围
+    range_items, plans = plan_projection(items, headers, columns, header_row, results)
+
+    # 3. 批量读取所有列范围并按列名拼回行
+    range_values = batch_get_values(access_token, range_items, max_workers=max_workers, params=params)
+    assemble_projection(plans, range_values, results)
+    return results
+
+
+async def batch_get_projected_async(access_token, items, columns, header_row=1, max_concurrency=1, params=None):
+    """batch_get_projected 的异步版本"""
+    results = [None] * len(items)
+    headers = await batch_get_values_async(access_token, projection_header_items(items, header_row),
+                                           max_concurrency=max_concurrency, params=params)
+    range_items, plans = plan_projection(items, headers, columns, header_row, results)
+    range_values = await batch_get_values_async(access_token, range_items,
+                                                max_concurrency=max_concurrency, params=params)
+    assemble_projection(plans, range_values, results)
+    return results
+
+
+def projection_header_items(items, header_row=1):
+    """列投影读取第一步：每个表的表头范围"""
+    return [
+        (spreadsheet_token, sheet_id, f"A{header_row}:{col_num_to_letter(column_count)}{header_row}")
+        for spreadsheet_token, sheet_id, _, column_count in items
+    ]
+
+
+def plan_projection(items, headers, columns, header_row, results):
+    """
+    列投影读取第二步：根据表头解析需要读取的列范围
+    表头读取失败或不含任何需要的列时，直接把结果写入 results
+    :return: (range_items, plans)
+    """
+    range_items, plans = [], []
+    for idx, ((spreadsheet_token, sheet_id, row_count, _), header) in enumerate(zip(items, headers)):
+        if isinstance(header, Exception):
+            results[idx] = header
+            continue
+        letters = resolve_columns(header[0] if header else [], columns)
+        if not letters:
+            results[idx] = [[]]
+            continue
+        ranges = projected_ranges(sheet_id, letters.values(), header_row, row_count)
+        plans.append((idx, letters, len(range_items), ranges))
+        range_items.extend((spreadsheet_token, sheet_id, range_ref) for range_ref, _ in ranges)
+    return range_items, plans
+
+
+def assemble_projection(plans, range_values, results):
+    """列投影读取第三步：按列名把各列范围拼回行，写入 results"""
+    for idx, letters, offset, ranges in plans:
+        chunks = range_values[offset:offset + len(ranges)]
+        error = next((chunk for chunk in chunks if isinstance(chunk, Exception)), None)
+        if error is not None:
+            results[idx] = error
+            continue
+
+        # 每个列范围的首行是表头，替换为列名
+        rows = merge_column_chunks(letters, ranges, chunks)
+        results[idx] = [list(letters)] + rows[1:]
+
+
+def merge_column_chunks(letters, ranges, chunks):
+    """
+    将按列范围读取到的数据拼回行
+    :param letters: {列名: 列字母}，决定输出列的顺序
+    :param ranges: projected_ranges 的返回值
+    :param chunks: 与 ranges 对应的二维数组
+    :return: 行列表，每行按 letters 的顺序排列
+    """
+    column_values = {}
+    for (_, range_letters), chunk in zip(ranges, chunks):
+        chunk = chunk or []
+        for pos, letter in enumerate(range_letters):
+            column_values[letter] = [row[pos] if row and pos < len(row) else None for row in chunk]
+
+    columns = [column_values.get(letter, []) for letter in letters.values()]
+    height = max((len(column) for column in columns), default=0)
+    return [
+        [column[r] if r < len(column) else None for column in columns]
+        for r in range(height)
+    ]
+
+
+# 流式读取时每个窗口的行数
+STREAM_WINDOW_ROWS = 5000
+
+
+def iter_sheet_rows(access_token, spreadsheet_token, sheet_id, row_count, column_count,
+                    columns=None, window=STREAM_WINDOW_ROWS, header_row=1, params=None):
+    """
+    按行窗口流式读取一个表，内存占用与表大小无关
+    :param row_count: 表的行数
+    :param column_count: 表的列数
+    :param columns: 需要的列名，为空时读取全部列
+    :param window: 每次请求读取的行数
+    :return: 生成器，首个产出为表头（指定 columns 时为找到的列名），之后逐行产出数据
+    """
+    last_col = col_num_to_letter(column_count)
+    header_values = values_batch_get(
+        access_token, spreadsheet_token, [f"{sheet_id}!A{header_row}:{last_col}{header_row}"], params
+    )
+    header = header_values[0][0] if header_values and header_values[0] else []
+
+    letters = resolve_columns(header, columns) if columns is not None else None
+    yield list(letters) if letters is not None else header
+    if letters is not None and not letters:
+        return
+
+    for start in range(header_row + 1, row_count + 1, window):
+        end = min(start + window - 1, row_count)
+        if letters is None:
+            chunk = values_batch_get(
+                access_token, spreadsheet_token, [f"{sheet_id}!A{start}:{last_col}{end}"], params
+            )[0]
+            rows = chunk or []
+        else:
+            ranges = projected_ranges(sheet_id, letters.values(), start, end)
+            chunks = values_batch_get(access_token, spreadsheet_token, [r for r, _ in ranges], params)
+            rows = merge_column_chunks(letters, ranges, chunks)
+        yield from rows
@@ -0,0 +1,431 @@
+# mock_server.py
+"""
+本地模拟飞书 Open API，用于离线压测与回归
+- 覆盖本项目用到的接口：
+  sheets v2 values / values_append / values_batch_get / metainfo，
+  sheets v3 sheets/query / sheets/{sheet_id}，drive v1 files，authen v2 oauth/token
+- 按配置生成任意大小的模拟表格（内容由行列号确定，多次读取结果一致）
+- 可注入延迟、频控错误码、5xx 错误以及 QPS 上限
+- 客户端只需设置 FEISHU_BASE_URL=http://127.0.0.1:<port>/open-apis
+
+运行：python -m modes.feishu.mock_server --rows 100000 --latency 50 --throttle-rate 0.05
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from quart import Quart, request, Response
+from core.env import MOCK_FEISHU_PORT, MOCK_SPREADSHEETS, MOCK_SHEETS, MOCK_ROWS, MOCK_COLUMNS, \
+    MOCK_LATENCY_MS, MOCK_THROTTLE_RATE, MOCK_ERROR_RATE, MOCK_QPS
+
+mock_app = Quart(__name__)
+
+# 与 ExcelTool.default_headers 一致，查履约等模式可以直接跑通
+MOCK_HEADERS = ['序号', 'BD', '达人名称', '带货店铺', '样品名', '合作类型', '发样数量', '性别', '粉丝量', '履约率',
+                '主页链接', '佣金率', '寄样批准日期', '发货日期', '订单号', '履约方式', '创作视频链接', '视频码']
+_CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+class MockConfig:
+    """模拟数据规模与故障注入配置，运行中可通过 POST /mock/config 修改"""
+
+    def __init__(self, **kwargs):
+        self.spreadsheets = MOCK_SPREADSHEETS   # 模拟表格数量
+        self.sheets = MOCK_SHEETS               # 每个表格的 sheet 数量
+        self.rows = MOCK_ROWS                   # 每个 sheet 的行数（含表头）
+        self.columns = MOCK_COLUMNS             # 每个 sheet 的列数
+        self.latency_ms = MOCK_LATENCY_MS       # 每个请求的基础延迟，实际延迟在 [0.5, 1.5] 倍之间浮动
+        self.throttle_rate = MOCK_THROTTLE_RATE  # 随机返回频控错误的概率
+        self.error_rate = MOCK_ERROR_RATE       # 随机返回 5xx 的概率
+        self.qps = MOCK_QPS                     # 每秒请求上限，超出返回频控错误；0 表示不限制
+        self.token_ttl = 7200                   # 签发的 access_token 有效期（秒）
+        self.update(**kwargs)
+
+    def update(self, **kwargs):
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise KeyError(f"未知配置项: {key}")
+            setattr(self, key, type(getattr(self, key))(value))
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class MockState:
+    """服务端状态：写入的数据、版本号、签发的令牌与请求统计"""
+
+    def __init__(self):
+        self.overlay = {}       # {(spreadsheet_token, sheet_id): {row: {col: value}}}
+        self.appended = {}      # {(spreadsheet_token, sheet_id): 追加（或写到表尾之后）的行数}
+        self.revisions = {}     # {spreadsheet_token: revision}
+        self.tokens = {}        # {access_token: 过期时间}
+        self.refresh_tokens = set()
+        self.window_start = 0.0
+        self.window_count = 0
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def reset(self):
+        self.__init__()
+
+
+config = MockConfig()
+state = MockState()
+
+
+# ---------------- 模拟数据 ----------------
+def spreadsheet_tokens():
+    return [f"mocksht{i:04d}" for i in range(config.spreadsheets)]
+
+
+def sheet_ids(spreadsheet_token):
+    return [f"{spreadsheet_token[-4:]}s{i}" for i in range(config.sheets)]
+
+
+def sheet_exists(spreadsheet_token, sheet_id) -> bool:
+    return spreadsheet_token in spreadsheet_tokens() and sheet_id in sheet_ids(spreadsheet_token)
+
+
+def row_count(spreadsheet_token, sheet_id) -> int:
+    return config.rows + state.appended.get((spreadsheet_token, sheet_id), 0)
+
+
+def header(col: int):
+    return MOCK_HEADERS[col - 1] if col <= len(MOCK_HEADERS) else f"列{col}"
+
+
+def cell_value(spreadsheet_token, sheet_id, row: int, col: int):
+    """按行列号生成单元格内容；被写入过的单元格返回写入的值"""
+    written = state.overlay.get((spreadsheet_token, sheet_id))
+    if written and row in written and col in written[row]:
+        return written[row][col]
+    if row > config.rows:
+        return None
+    if row == 1:
+        return header(col)
+    name = header(col)
+    n = row - 1
+    if name == "序号":
+        # 每 50 行留一个空序号，模拟表尾 / 分隔行
+        return None if n % 50 == 0 else n
+    if name == "订单号":
+        return None if n % 7 == 0 else f"{sheet_id}{n:08d}"
+    if name == "履约方式":
+        return None if n % 3 else ["直播", "短视频"][n % 2]
+    if name in ("寄样批准日期", "发货日期"):
+        return 45000 + n % 365
+    if name in ("主页链接", "创作视频链接"):
+        link = f"https://example.com/{sheet_id}/{n}"
+        return [{"type": "url", "text": link, "link": link}]
+    if name in ("发样数量", "粉丝量"):
+        return n * 37 % 100000
+    return f"{name}{n}"
+
+
+def parse_cell(ref: str, default_col: int, default_row: int):
+    match = _CELL_RE.match(ref.upper())
+    if not match:
+        raise ValueError(f"无效的单元格: {ref}")
+    letters, digits = match.groups()
+    col = 0
+    for ch in letters:
+        col = col * 26 + ord(ch) - 64
+    return col or default_col, int(digits) if digits else default_row
+
+
+def parse_range(range_ref: str):
+    """解析 sheetId!A1:C10 / sheetId!A:C / sheetId，返回 (sheet_id, 起始行, 起始列, 结束行, 结束列)"""
+    sheet_id, _, cells = range_ref.partition("!")
+    if not cells:
+        return sheet_id, 1, 1, None, None
+    start, _, end = cells.partition(":")
+    start_col, start_row = parse_cell(start, 1, 1)
+    end_col, end_row = parse_cell(end, None, None) if end else (start_col, start_row)
+    return sheet_id, start_row, start_col, end_row, end_col
+
+
+def read_range(spreadsheet_token, range_ref):
+    sheet_id, start_row, start_col, end_row, end_col = parse_range(range_ref)
+    end_row = min(end_row or row_count(spreadsheet_token, sheet_id), row_count(spreadsheet_token, sheet_id))
+    end_col = end_col or config.columns
+    values = [
+        [cell_value(spreadsheet_token, sheet_id, row, col) for col in range(start_col, end_col + 1)]
+        for row in range(start_row, end_row + 1)
+    ]
+    return {
+        "majorDimension": "ROWS",
+        "range": range_ref,
+        "revision": state.revisions.get(spreadsheet_token, 1),
+        "values": values,
+    }
+
+
+def write_range(spreadsheet_token, range_ref, values, start_row=None):
+    sheet_id, range_start_row, start_col, _, _ = parse_range(range_ref)
+    start_row = start_row or range_start_row
+    written = state.overlay.setdefault((spreadsheet_token, sheet_id), {})
+    for row_offset, row_values in enumerate(values):
+        cells = written.setdefault(start_row + row_offset, {})
+        for col_offset, value in enumerate(row_values):
+            cells[start_col + col_offset] = value
+    state.revisions[spreadsheet_token] = state.revisions.get(spreadsheet_token, 1) + 1
+    end_row = start_row + len(values) - 1
+    # 写到表尾之后时表格随之扩展
+    if end_row > row_count(spreadsheet_token, sheet_id):
+        state.appended[(spreadsheet_token, sheet_id)] = end_row - config.rows
+    end_col = start_col + max((len(row) for row in values), default=1) - 1
+    return {
+        "spreadsheetToken": spreadsheet_token,
+        "updatedRange": f"{sheet_id}!{_col_letter(start_col)}{start_row}:{_col_letter(end_col)}{end_row}",
+        "updatedRows": len(values),
+        "updatedColumns": end_col - start_col + 1,
+        "updatedCells": sum(len(row) for row in values),
+        "revision": state.revisions[spreadsheet_token],
+    }
+
+
+def _col_letter(n: int) -> str:
+    result = ""
+    while n > 0:
+        n, remainder = divmod(n - 1, 26)
+        result = chr(65 + remainder) + result
+    return result
+
+
+def sheet_meta(spreadsheet_token, sheet_id, index: int) -> dict:
+    return {
+        "sheet_id": sheet_id,
+        "title": f"Sheet{index + 1}",
+        "index": index,
+        "hidden": False,
+        "grid_properties": {
+            "frozen_row_count": 1,
+            "frozen_column_count": 0,
+            "row_count": row_count(spreadsheet_token, sheet_id),
+            "column_count": config.columns,
+        },
+        "resource_type": "sheet",
+    }
+
+
+# ---------------- 响应 ----------------
+def ok(data=None, **extra):
+    return _json({"code": 0, "msg": "success", "data": data or {}, **extra})
+
+
+def fail(code: int, msg: str, status: int = 400, headers=None):
+    return _json({"code": code, "msg": msg}, status, headers)
+
+
+def _json(body, status: int = 200, headers=None):
+    return Response(json.dumps(body, ensure_ascii=False), status=status, headers=headers,
+                    content_type="application/json; charset=utf-8")
+
+
+def _bearer_token():
+    auth = request.headers.get("Authorization", "")
+    return auth[7:] if auth.startswith("Bearer ") else None
+
+
+@mock_app.before_request
+async def inject_faults():
+    """统一注入延迟、QPS 限制、随机频控与 5xx；令牌过期时返回对应错误码"""
+    if not request.path.startswith("/open-apis/"):
+        return None
+    state.stats["requests"] += 1
+    if config.latency_ms > 0:
+        await asyncio.sleep(config.latency_ms * random.uniform(0.5, 1.5) / 1000)
+
+    now = time.monotonic()
+    if now - state.window_start >= 1:
+        state.window_start, state.window_count = now, 0
+    state.window_count += 1
+    over_qps = config.qps > 0 and state.window_count > config.qps
+    if over_qps or random.random() < config.throttle_rate:
+        state.stats["throttled"] += 1
+        reset = max(1, int(state.window_start + 1 - now + 0.999)) if over_qps else 1
+        return fail(99991400, "request trigger frequency limit", 429, {"x-ogw-ratelimit-reset": str(reset)})
+    if random.random() < config.error_rate:
+        state.stats["errors"] += 1
+        return _json({"code": 1, "msg": "internal error"}, random.choice((500, 502, 503)))
+
+    token = _bearer_token()
+    if token in state.tokens and state.tokens[token] <= time.time():
+        return fail(99991677, "token expired", 400)
+    return None
+
+
+# ---------------- 授权 ----------------
+@mock_app.route("/open-apis/authen/v2/oauth/token", methods=["POST"])
+async def oauth_token():
+    payload = await request.get_json(force=True, silent=True) or {}
+    grant_type = payload.get("grant_type")
+    if grant_type == "refresh_token":
+        refresh_token = payload.get("refresh_token")
+        if refresh_token not in state.refresh_tokens:
+            return fail(20064, "refresh token invalid", 400)
+        # refresh_token 只能使用一次，每次刷新都会轮换
+        state.refresh_tokens.discard(refresh_token)
+    elif grant_type != "authorization_code" or not payload.get("code"):
+        return fail(20050, "invalid grant", 400)
+
+    access_token = f"mock-u-{uuid.uuid4().hex}"
+    refresh_token = f"mock-ur-{uuid.uuid4().hex}"
+    state.tokens[access_token] = time.time() + config.token_ttl
+    state.refresh_tokens.add(refresh_token)
+    return _json({
+        "code": 0,
+        "access_token": access_token,
+        "expires_in": config.token_ttl,
+        "refresh_token": refresh_token,
+        "refresh_token_expires_in": 604800,
+        "token_type": "Bearer",
+        "scope": "drive:drive sheets:spreadsheet offline_access",
+    })
+
+
+# ---------------- 云空间 ----------------
+@mock_app.route("/open-apis/drive/v1/files", methods=["GET"])
+async def drive_files():
+    """根目录下为一个文件夹与一半的表格，文件夹内为另一半表格"""
+    folder_token = request.args.get("folder_token") or ""
+    page_size = int(request.args.get("page_size", 50))
+    offset = int(request.args.get("page_token") or 0)
+    tokens = spreadsheet_tokens()
+    half = len(tokens) // 2
+    if folder_token == "":
+        files = [{"token": "mockfld0000", "name": "模拟文件夹", "type": "folder", "parent_token": "",
+                  "modified_time": str(state.revisions.get("mockfld0000", 1))}]
+        children = tokens[:half]
+    elif folder_token == "mockfld0000":
+        files, children = [], tokens[half:]
+    else:
+        return fail(1061004, "folder not found", 404)
+    files += [
+        {"token": token, "name": f"模拟表格{token[-4:]}", "type": "sheet", "parent_token": folder_token,
+         "modified_time": str(state.revisions.get(token, 1)),
+         "url": f"https://example.feishu.cn/sheets/{token}"}
+        for token in children
+    ]
+    page = files[offset:offset + page_size]
+    has_more = offset + page_size < len(files)
+    return ok({"files": page, "has_more": has_more, "next_page_token": str(offset + page_size) if has_more else ""})
+
+
+# ---------------- 电子表格 ----------------
+@mock_app.route("/open-apis/sheets/v3/spreadsheets/<spreadsheet_token>/sheets/query", methods=["GET"])
+async def sheets_query(spreadsheet_token):
+    if spreadsheet_token not in spreadsheet_tokens():
+        return fail(1310214, "spreadsheet not found", 404)
+    return ok({"sheets": [sheet_meta(spreadsheet_token, sheet_id, i)
+                          for i, sheet_id in enumerate(sheet_ids(spreadsheet_token))]})
+
+
+@mock_app.route("/open-apis/sheets/v3/spreadsheets/<spreadsheet_token>/sheets/<sheet_id>", methods=["GET"])
+async def sheet_get(spreadsheet_token, sheet_id):
+    if not sheet_exists(spreadsheet_token, sheet_id):
+        return fail(1310214, "sheet not found", 404)
+    return ok({"sheet": sheet_meta(spreadsheet_token, sheet_id, sheet_ids(spreadsheet_token).index(sheet_id))})
+
+
+@mock_app.route("/open-apis/sheets/v2/spreadsheets/<spreadsheet_token>/metainfo", methods=["GET"])
+async def metainfo(spreadsheet_token):
+    if spreadsheet_token not in spreadsheet_tokens():
+        return fail(1310214, "spreadsheet not found", 404)
+    sheets = [
+        {"sheetId": sheet_id, "title": f"Sheet{i + 1}", "index": i,
+         "rowCount": row_count(spreadsheet_token, sheet_id), "columnCount": config.columns}
+        for i, sheet_id in enumerate(sheet_ids(spreadsheet_token))
+    ]
+    return ok({
+        "properties": {"title": f"模拟表格{spreadsheet_token[-4:]}", "sheetCount": len(sheets),
+                       "revision": state.revisions.get(spreadsheet_token, 1)},
+        "sheets": sheets,
+        "spreadsheetToken": spreadsheet_token,
+    })
+
+
+@mock_app.route("/open-apis/sheets/v2/spreadsheets/<spreadsheet_token>/values/<path:value_range>", methods=["GET"])
+async def values_get(spreadsheet_token, value_range):
+    if not sheet_exists(spreadsheet_token, parse_range(value_range)[0]):
+        return fail(1310214, "sheet not found", 404)
+    return ok({"revision": state.revisions.get(spreadsheet_token, 1), "spreadsheetToken": spreadsheet_token,
+               "valueRange": read_range(spreadsheet_token, value_range)})
+
+
+@mock_app.route("/open-apis/sheets/v2/spreadsheets/<spreadsheet_token>/values_batch_get", methods=["GET"])
+async def values_batch_get(spreadsheet_token):
+    ranges = [r for r in request.args.get("ranges", "").split(",") if r]
+    if not ranges:
+        return fail(90202, "ranges required", 400)
+    for range_ref in ranges:
+        if not sheet_exists(spreadsheet_token, parse_range(range_ref)[0]):
+            return fail(1310214, f"sheet not found: {range_ref}", 404)
+    return ok({"revision": state.revisions.get(spreadsheet_token, 1), "spreadsheetToken": spreadsheet_token,
+               "totalCells": 0, "valueRanges": [read_range(spreadsheet_token, r) for r in ranges]})
+
+
+@mock_app.route("/open-apis/sheets/v2/spreadsheets/<spreadsheet_token>/values", methods=["PUT"])
+async def values_put(spreadsheet_token):
+    value_range = ((await request.get_json(force=True, silent=True)) or {}).get("valueRange") or {}
+    if not sheet_exists(spreadsheet_token, parse_range(value_range.get("range", ""))[0]):
+        return fail(1310214, "sheet not found", 404)
+    return ok(write_range(spreadsheet_token, value_range["range"], value_range.get("values") or []))
+
+
+@mock_app.route("/open-apis/sheets/v2/spreadsheets/<spreadsheet_token>/values_append", methods=["POST"])
+async def values_append(spreadsheet_token):
+    value_range = ((await request.get_json(force=True, silent=True)) or {}).get("valueRange") or {}
+    sheet_id = parse_range(value_range.get("range", ""))[0]
+    if not sheet_exists(spreadsheet_token, sheet_id):
+        return fail(1310214, "sheet not found", 404)
+    values = value_range.get("values") or []
+    start_row = row_count(spreadsheet_token, sheet_id) + 1
+    updates = write_range(spreadsheet_token, value_range["range"], values, start_row=start_row)
+    return ok({"revision": updates["revision"], "spreadsheetToken": spreadsheet_token,
+               "tableRange": value_range["range"], "updates": updates})
+
+
+# ---------------- 控制接口 ----------------
+@mock_app.route("/mock/config", methods=["GET", "POST"])
+async def mock_config():
+    """GET 查看配置与请求统计；POST 修改配置，如 {"throttle_rate": 0.1, "reset": true}"""
+    if request.method == "POST":
+        payload = dict(await request.get_json(force=True, silent=True) or {})
+        if payload.pop("reset", False):
+            state.reset()
+        try:
+            config.update(**payload)
+        except (KeyError, ValueError) as e:
+            return _json({"error": str(e)}, 400)
+    return _json({"config": config.to_dict(), "stats": state.stats})
+
+
+async def run_mock_server_async(host: str = "127.0.0.1", port: int = MOCK_FEISHU_PORT):
+    await mock_app.run_task(host=host, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟飞书 Open API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=MOCK_FEISHU_PORT)
+    parser.add_argument("--spreadsheets", type=int, default=config.spreadsheets)
+    parser.add_argument("--sheets", type=int, default=config.sheets)
+    parser.add_argument("--rows", type=int, default=config.rows)
+    parser.add_argument("--columns", type=int, default=config.columns)
+    parser.add_argument("--latency", type=int, default=config.latency_ms, help="基础延迟（毫秒）")
+    parser.add_argument("--throttle-rate", type=float, default=config.throttle_rate)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--qps", type=int, default=config.qps)
+    args = parser.parse_args()
+    config.update(spreadsheets=args.spreadsheets, sheets=args.sheets, rows=args.rows, columns=args.columns,
+                  latency_ms=args.latency, throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                  qps=args.qps)
+    print(f"模拟飞书接口: FEISHU_BASE_URL=http://{args.host}:{args.port}/open-apis")
+    asyncio.run(run_mock_server_async(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
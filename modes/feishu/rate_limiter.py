@@ -0,0 +1,96 @@
+# rate_limiter.py
+"""
+飞书接口客户端限流
+- 按接口分组的令牌桶，每组有独立的 QPS 预算
+- 触发频控时预算按比例下调，之后随成功请求逐步恢复（AIMD）
+"""
+import re
+import time
+import threading
+
+
+class TokenBucket:
+    """自适应令牌桶"""
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 0.5,
+                 decrease_factor: float = 0.5, recover_step: float = 0.05):
+        """
+        :param rate: 每秒允许的请求数（预算上限）
+        :param capacity: 桶容量（允许的突发请求数），默认等于 rate
+        :param min_rate: 下调后的最低速率
+        :param decrease_factor: 被限流时速率乘以的系数
+        :param recover_step: 每次成功请求恢复的速率（占预算上限的比例）
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.recover_step = recover_step
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self) -> float:
+        """预占一个令牌，返回调用方需要等待的秒数"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到获得令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_throttled(self):
+        """被限流：下调速率，并清空已积累的令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, 0)
+
+    def on_success(self):
+        """请求成功：逐步恢复速率"""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recover_step)
+
+
+# 接口分组及默认 QPS 预算：(分组名, HTTP 方法, 路径正则, 每秒请求数)
+# 按顺序匹配，第一条命中的规则生效
+DEFAULT_BUDGETS = [
+    ("oauth", None, r"^authen/", 5),
+    ("sheets_write", ("POST", "PUT"), r"^sheets/", 20),
+    ("sheets_read", ("GET",), r"^sheets/", 50),
+    ("drive", None, r"^drive/", 5),
+    ("default", None, r"", 10),
+]
+
+
+class RateLimiter:
+    """按接口分组的限流器"""
+
+    def __init__(self, budgets=None):
+        self._rules = []
+        self.buckets = {}
+        for name, methods, pattern, rate in budgets or DEFAULT_BUDGETS:
+            self._rules.append((name, methods, re.compile(pattern)))
+            self.buckets[name] = TokenBucket(rate)
+
+    def bucket_for(self, method: str, path: str) -> TokenBucket:
+        """根据请求方法和相对路径找到对应的令牌桶"""
+        path = path.lstrip("/")
+        for name, methods, pattern in self._rules:
+            if (methods is None or method.upper() in methods) and pattern.search(path):
+                return self.buckets[name]
+        return self.buckets[self._rules[-1][0]]
@@ -0,0 +1,102 @@
+# sheet_sync.py
+"""
+基于表格版本号（revision）的增量同步
+- 记录每个 sheet 快照对应的 revision
+- 表格 revision 未变化的 sheet 直接从本地列式快照加载为 DataFrame，变化的才重新下载
+"""
+from core.logger import logger
+from modes.feishu.feishu_sheet import get_spreadsheet_revision, get_spreadsheet_revision_async
+from modes.persistence.snapshot_store import SnapshotStore
+from modes.persistence.metadata_cache import metadata_cache
+
+
+class SheetSync:
+    """增量同步层"""
+
+    def __init__(self, store: SnapshotStore = None):
+        self.store = store or SnapshotStore()
+
+    def is_fresh(self, spreadsheet_token, sheet_id, revision, columns=None) -> bool:
+        """快照是否与表格当前版本一致"""
+        if revision is None:
+            return False
+        meta = self.store.get_meta(spreadsheet_token, sheet_id)
+        return bool(meta) and meta.get("revision") == revision and meta.get("columns") == columns
+
+    def sync(self, access_token, spreadsheet_token, sheet_ids, fetch, columns=None):
+        """
+        同步多个 sheet
+        :param sheet_ids: 需要的 sheet_id 列表
+        :param fetch: 下载函数 fetch(需要下载的 sheet_id 列表)，返回与之顺序一致的列表，
+                      单项为二维数组、行生成器或 Exception
+        :param columns: 下载时使用的列投影，作为快照的一部分校验
+        :return: 与 sheet_ids 顺序一致的列表，单项为 DataFrame（本地快照）、行序列（首行为表头）或 Exception
+        """
+        # revision 是整个表格级别的，任何 sheet 变化都会使其增加
+        try:
+            revision = get_spreadsheet_revision(access_token, spreadsheet_token)
+        except Exception as e:
+            logger.warning(f"获取表格版本号失败，将全部重新下载: {e}")
+            revision = None
+
+        results, stale = self._split_fresh(spreadsheet_token, sheet_ids, revision, columns)
+        if stale:
+            self._invalidate_metadata(spreadsheet_token)
+            fetched = fetch([sheet_ids[pos] for pos in stale])
+            self._store_fetched(spreadsheet_token, sheet_ids, revision, columns, results, stale, fetched)
+        return results
+
+    async def sync_async(self, access_token, spreadsheet_token, sheet_ids, fetch, columns=None):
+        """sync 的异步版本，fetch 为协程函数"""
+        try:
+            revision = await get_spreadsheet_revision_async(access_token, spreadsheet_token)
+        except Exception as e:
+            logger.warning(f"获取表格版本号失败，将全部重新下载: {e}")
+            revision = None
+
+        results, stale = self._split_fresh(spreadsheet_token, sheet_ids, revision, columns)
+        if stale:
+            self._invalidate_metadata(spreadsheet_token)
+            fetched = await fetch([sheet_ids[pos] for pos in stale])
+            self._store_fetched(spreadsheet_token, sheet_ids, revision, columns, results, stale, fetched)
+        return results
+
+    @staticmethod
+    def _invalidate_metadata(spreadsheet_token):
+        """
+        需要下载说明表格在快照之后有变化（或没有快照）；缓存的行列数可能早于当前 revision，
+        按旧的行数下载会少读新增的行，并以新 revision 保存为快照，所以下载前重新查询元数据
+        """
+        metadata_cache.invalidate(spreadsheet_token)
+
+    def _split_fresh(self, spreadsheet_token, sheet_ids, revision, columns):
+        """快照有效的 sheet 直接加载快照，返回 (results, 需要下载的位置列表)"""
+        results = [None] * len(sheet_ids)
+        stale = []
+        for pos, sheet_id in enumerate(sheet_ids):
+            if self.is_fresh(spreadsheet_token, sheet_id, revision, columns):
+                try:
+                    results[pos] = self.store.load_frame(spreadsheet_token, sheet_id)
+                    logger.info(f"{sheet_id} 未变化，使用本地快照 (revision={revision})")
+                    continue
+                except Exception as e:
+                    logger.warning(f"{sheet_id} 本地快照读取失败，重新下载: {e}")
+            stale.append(pos)
+        return results, stale
+
+    def _store_fetched(self, spreadsheet_token, sheet_ids, revision, columns, results, stale, fetched):
+        """保存新下载的数据为快照，并填入 results"""
+        for pos, values in zip(stale, fetched):
+            sheet_id = sheet_ids[pos]
+            if isinstance(values, Exception) or revision is None:
+                results[pos] = values
+            elif isinstance(values, list):
+                self.store.save(spreadsheet_token, sheet_id, revision, values, columns)
+                results[pos] = values
+            else:
+                # 流式读取的大表：边消费边写快照
+                results[pos] = self.store.write_rows(spreadsheet_token, sheet_id, revision, values, columns)
+
+
+# 全局同步实例
+sheet_sync = SheetSync()
@@ -0,0 +1,109 @@
+# single_flight.py
+"""
+读请求合并与短时缓存
+- 相同的 GET 请求（同一接口、参数与 token）同时发起时只真正发送一次，其余调用方等待并共享结果
+- 成功的响应在极短时间内缓存，UI 连续触发的重复读取直接命中
+- 写请求之后清空缓存，避免读到旧数据
+"""
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from core.env import FEISHU_READ_CACHE_TTL, FEISHU_READ_CACHE_SIZE, FEISHU_READ_CACHE_MAX_BYTES
+
+
+def request_key(url: str, params=None, access_token=None) -> str:
+    """同一接口 + 参数 + token 视为相同请求"""
+    query = json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{access_token or ''} {url}?{query}"
+
+
+class ResponseCache:
+    """带 TTL 与容量上限（LRU）的响应缓存，线程安全"""
+
+    def __init__(self, ttl: float = FEISHU_READ_CACHE_TTL, max_size: int = FEISHU_READ_CACHE_SIZE,
+                 max_bytes: int = FEISHU_READ_CACHE_MAX_BYTES):
+        """
+        :param ttl: 缓存有效期（秒），0 表示不缓存（仍会合并并发请求）
+        :param max_size: 最多缓存的响应数
+        :param max_bytes: 单个响应超过该大小时不缓存，避免大表数据长期占用内存
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, resp = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return resp
+
+    def put(self, key, resp):
+        if self.ttl <= 0 or len(resp.content) > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, resp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LeaderCancelled(Exception):
+    """发送请求的调用方被取消：共享结果的跟随者收到该异常后重新发起请求（不会被连带取消）"""
+
+
+class SingleFlight:
+    """同步版本：并发的相同请求共享同一个 Future"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """
+        :return: (future, leader)；leader 为 True 的调用方负责真正发送请求并设置结果
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def leave(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """异步版本：asyncio.Future 绑定事件循环，与 AsyncFeishuClient 在同一个循环中使用"""
+
+    def __init__(self):
+        self._calls = {}
+
+    def join(self, key):
+        future = self._calls.get(key)
+        if future is not None and not future.done():
+            return future, False
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        # 没有跟随者时也要取走异常，避免 "exception was never retrieved" 警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future, True
+
+    def leave(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
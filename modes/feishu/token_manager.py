@@ -0,0 +1,160 @@
+# token_manager.py
+"""
+user_access_token 管理
+- 持久化 access_token 与 refresh_token（refresh_token 每次刷新都会轮换）
+- 后台线程在到期前主动刷新
+- 并发调用方共享同一次刷新
+"""
+import time
+import asyncio
+import threading
+from core.env import TOKEN_REFRESH_MARGIN
+from core.logger import logger
+from modes.persistence.storage import Storage
+from modes.feishu.feishu_auth import refresh_access_token, request_token_async, code_payload
+
+
+class TokenManager:
+    """令牌管理器"""
+
+    def __init__(self, storage: Storage, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        """
+        :param storage: 令牌存储（与 MainApp.token_storage 共用）
+        :param refresh_margin: 距离过期多少秒时开始刷新
+        """
+        self.storage = storage
+        self.refresh_margin = refresh_margin
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    # ---------------- 状态 ----------------
+    @property
+    def access_token(self):
+        return self.storage.get("user_token")
+
+    @property
+    def expire_time(self) -> int:
+        return self.storage.get("expire_time") or 0
+
+    @property
+    def refresh_token(self):
+        return self.storage.get("refresh_token")
+
+    def is_valid(self) -> bool:
+        """access_token 是否仍在有效期内"""
+        return bool(self.access_token) and time.time() < self.expire_time
+
+    def needs_refresh(self) -> bool:
+        """access_token 是否即将过期"""
+        return not self.access_token or time.time() >= self.expire_time - self.refresh_margin
+
+    def can_refresh(self) -> bool:
+        """refresh_token 是否可用"""
+        refresh_expire_time = self.storage.get("refresh_expire_time") or 0
+        return bool(self.refresh_token) and time.time() < refresh_expire_time
+
+    def add_listener(self, callback):
+        """令牌变化回调 callback(access_token)，刷新失败且令牌失效时传入 None"""
+        self._listeners.append(callback)
+
+    def _notify(self, token):
+        for callback in self._listeners:
+            try:
+                callback(token)
+            except Exception as e:
+                logger.error(f"令牌回调错误: {e}")
+
+    # ---------------- 保存 / 清除 ----------------
+    def save(self, data: dict):
+        """保存 oauth/token 接口返回的数据"""
+        now = int(time.time())
+        values = {
+            "user_token": data["access_token"],
+            "expire_time": now + int(data["expires_in"]),
+        }
+        if data.get("refresh_token"):
+            values["refresh_token"] = data["refresh_token"]
+            values["refresh_expire_time"] = now + int(data.get("refresh_token_expires_in") or 0)
+        self.storage.update(values)
+        self._wake_event.set()
+        self._notify(values["user_token"])
+
+    def clear(self):
+        for key in ("user_token", "expire_time", "refresh_token", "refresh_expire_time"):
+            self.storage.delete(key)
+        self._notify(None)
+
+    async def exchange_code_async(self, code):
+        """用授权码换取令牌并保存"""
+        data = await request_token_async(code_payload(code))
+        self.save(data)
+        return data["access_token"]
+
+    # ---------------- 刷新 ----------------
+    def refresh(self, force: bool = False, stale_token=None) -> bool:
+        """
+        刷新 access_token
+        多个调用方同时刷新时只有第一个真正发起请求，其余等待并复用其结果
+        :param force: 即使未到刷新时间也强制刷新（如接口返回 token 失效）
+        :param stale_token: 已失效的 token；当前 token 与之不同说明已被其他调用方刷新
+        :return: 令牌是否已更新（或已由其他调用方更新 / 仍无需刷新）
+        """
+        stale_token = stale_token or self.access_token
+        with self._refresh_lock:
+            # 等锁期间其他调用方可能已经刷新过
+            if self.access_token != stale_token or (not force and not self.needs_refresh()):
+                return self.is_valid()
+            if not self.can_refresh():
+                logger.warning("refresh_token 不存在或已过期，需重新授权")
+                return False
+            try:
+                self.save(refresh_access_token(self.refresh_token))
+                logger.success(f"令牌已刷新，到期时间: {self.expire_time}")
+                return True
+            except Exception as e:
+                logger.error(f"刷新令牌失败: {e}")
+                if not self.is_valid():
+                    self._notify(None)
+                return False
+
+    def get_token(self):
+        """返回一个可用的 access_token，即将过期时先刷新"""
+        if self.needs_refresh():
+            self.refresh()
+        return self.access_token
+
+    async def get_token_async(self):
+        """get_token 的异步版本，需要刷新时在线程中执行，不阻塞事件循环"""
+        if self.needs_refresh():
+            await asyncio.to_thread(self.refresh)
+        return self.access_token
+
+    # ---------------- 后台刷新 ----------------
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self.access_token or (self.needs_refresh() and not self.can_refresh()):
+                # 没有可刷新的令牌，等待重新授权后 save() 唤醒
+                wait = 3600
+            elif self.needs_refresh():
+                # 刷新失败时稍后重试
+                wait = 0 if self.refresh() else 60
+            else:
+                wait = self.expire_time - self.refresh_margin - time.time()
+            if wait > 0:
+                self._wake_event.wait(wait)
+                self._wake_event.clear()
@@ -0,0 +1,267 @@
+# filter_engine.py
+"""
+列式筛选引擎
+- 条件以声明式表达式描述，如 col("序号").not_empty() & col("履约方式").empty()
+- 在 pandas 列上向量化求值，不逐行循环
+- 支持非空 / 等于 / 属于集合 / 日期范围 / 正则匹配，可对逐行生成器分块流式求值
+- 条件可以保存为模块常量，供各模式（查履约、查到货、催视频码、通过样品）复用
+"""
+import re
+from abc import ABC, abstractmethod
+from itertools import compress
+import numpy as np
+import pandas as pd
+from modes.feishu.fast_decode import values_to_frame, header_names
+
+# 视为空值的单元格内容（None / NaN 之外）
+EMPTY_STRINGS = ("", "null")
+
+
+class Condition(ABC):
+    """筛选条件基类，支持 & | ~ 组合"""
+
+    @abstractmethod
+    def columns(self) -> set:
+        """条件引用的列"""
+
+    @abstractmethod
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        """返回与 frame 行数一致的布尔数组"""
+
+    def __and__(self, other):
+        return All(self, other)
+
+    def __or__(self, other):
+        return Any(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class All(Condition):
+    def __init__(self, *conditions: Condition):
+        # 展开嵌套的 All，a & b & c 只生成一层
+        self.conditions = [c for cond in conditions for c in (cond.conditions if isinstance(cond, All) else [cond])]
+
+    def columns(self) -> set:
+        return set().union(*(c.columns() for c in self.conditions))
+
+    def mask(self, frame):
+        result = np.ones(len(frame), dtype=bool)
+        for condition in self.conditions:
+            result &= condition.mask(frame)
+        return result
+
+    def __repr__(self):
+        return " & ".join(map(repr, self.conditions))
+
+
+class Any(Condition):
+    def __init__(self, *conditions: Condition):
+        self.conditions = [c for cond in conditions for c in (cond.conditions if isinstance(cond, Any) else [cond])]
+
+    def columns(self) -> set:
+        return set().union(*(c.columns() for c in self.conditions))
+
+    def mask(self, frame):
+        result = np.zeros(len(frame), dtype=bool)
+        for condition in self.conditions:
+            result |= condition.mask(frame)
+        return result
+
+    def __repr__(self):
+        return "(" + " | ".join(map(repr, self.conditions)) + ")"
+
+
+class Not(Condition):
+    def __init__(self, condition: Condition):
+        self.condition = condition
+
+    def columns(self) -> set:
+        return self.condition.columns()
+
+    def mask(self, frame):
+        return ~self.condition.mask(frame)
+
+    def __repr__(self):
+        return f"~{self.condition!r}"
+
+
+class Predicate(Condition):
+    """单列条件"""
+
+    def __init__(self, column: str, op: str, func, *args):
+        """
+        :param func: func(series, *args) -> 布尔数组
+        """
+        self.column = column
+        self.op = op
+        self.func = func
+        self.args = args
+
+    def columns(self) -> set:
+        return {self.column}
+
+    def mask(self, frame):
+        return np.asarray(self.func(frame[self.column], *self.args), dtype=bool)
+
+    def __repr__(self):
+        args = ", ".join(map(repr, self.args))
+        return f"col({self.column!r}).{self.op}({args})"
+
+
+def is_empty(series: pd.Series, strip: bool = False) -> np.ndarray:
+    """None / NaN / 空字符串 / "null" 视为空；strip 为 True 时只含空白的字符串也视为空"""
+    if strip:
+        series = series.map(lambda v: v.strip() if isinstance(v, str) else v)
+    return (series.isna() | series.isin(EMPTY_STRINGS)).to_numpy()
+
+
+def to_datetime(series: pd.Series) -> pd.Series:
+    """
+    单元格值转换为时间，无法识别的为 NaT
+    - 数字视为 Excel / 飞书的日期序列号（1899-12-30 起的天数）
+    - datetime / date 与日期字符串按 pandas 规则解析
+    """
+    is_number = series.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).to_numpy(dtype=bool)
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    if is_number.any():
+        result[is_number] = pd.to_datetime(series[is_number].astype(float), unit="D", origin="1899-12-30",
+                                           errors="coerce")
+    others = ~is_number & ~is_empty(series, strip=True)
+    if others.any():
+        result[others] = pd.to_datetime(series[others], errors="coerce", format="mixed")
+    return result
+
+
+def between(series: pd.Series, start, end) -> np.ndarray:
+    """日期在 [start, end] 内（两端都包含，None 表示不限），无法解析为日期的值不满足"""
+    dates = to_datetime(series)
+    result = dates.notna()
+    if start is not None:
+        result &= dates >= pd.Timestamp(start)
+    if end is not None:
+        result &= dates <= pd.Timestamp(end)
+    return result.to_numpy()
+
+
+def matches(series: pd.Series, pattern: re.Pattern) -> np.ndarray:
+    """正则匹配（re.search 语义），空值按空字符串匹配"""
+    text = series.where(series.notna(), "").astype(str)
+    return text.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+
+class Column:
+    """列引用，用于构造单列条件"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def empty(self, strip: bool = False) -> Predicate:
+        return Predicate(self.name, "empty", is_empty, strip)
+
+    def not_empty(self, strip: bool = False) -> Condition:
+        return Predicate(self.name, "not_empty", lambda s, st: ~is_empty(s, st), strip)
+
+    def eq(self, value) -> Predicate:
+        return Predicate(self.name, "eq", lambda s, v: (s == v).to_numpy(), value)
+
+    def isin(self, values) -> Predicate:
+        values = tuple(values)
+        return Predicate(self.name, "isin", lambda s, vs: s.isin(vs).to_numpy(), values)
+
+    def between(self, start=None, end=None) -> Predicate:
+        """日期范围，start / end 可以是日期字符串、datetime 或 date"""
+        return Predicate(self.name, "between", between, start, end)
+
+    def matches(self, pattern, flags: int = 0) -> Predicate:
+        return Predicate(self.name, "matches", matches, re.compile(pattern, flags))
+
+
+def col(name: str) -> Column:
+    return Column(name)
+
+
+class RowFilter:
+    """
+    命名的筛选定义：条件 + 输出列
+    例：RowFilter("查履约", col("序号").not_empty() & col("履约方式").empty(), output=["订单号"])
+    """
+
+    def __init__(self, name: str, condition: Condition, output=None):
+        self.name = name
+        self.condition = condition
+        self.output = list(output) if output else None
+
+    @property
+    def columns(self) -> list:
+        """求值需要读取的列（条件列 + 输出列，保持稳定顺序）"""
+        needed = sorted(self.condition.columns())
+        for name in self.output or []:
+            if name not in needed:
+                needed.append(name)
+        return needed
+
+    def missing_columns(self, header) -> list:
+        return [name for name in self.columns if name not in header]
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """返回满足条件的行（只含输出列），缺列时抛出 KeyError"""
+        missing = self.missing_columns(frame.columns)
+        if missing:
+            raise KeyError(f"缺少列: {missing}")
+        selected = frame.loc[self.condition.mask(frame)]
+        return selected[self.output] if self.output else selected
+
+    def count(self, frame: pd.DataFrame) -> int:
+        return int(self.condition.mask(frame).sum())
+
+    @staticmethod
+    def _chunk_frame(chunk, columns) -> pd.DataFrame:
+        """块（首行为表头）转换为 DataFrame；不需要任何列时也保留数据行数，空条件才会全部满足"""
+        if not columns:
+            return pd.DataFrame(index=pd.RangeIndex(len(chunk) - 1))
+        return values_to_frame(chunk, columns=columns)
+
+    def _iter_chunks(self, rows, chunk_rows: int):
+        """按块切分逐行数据，每块都以表头开头；表头缺列时抛出 KeyError"""
+        rows = iter(rows or [])
+        header = next(rows, None)
+        if not header:
+            return
+        missing = self.missing_columns(header_names(header))
+        if missing:
+            raise KeyError(f"缺少列: {missing}")
+        chunk = [header]
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) > chunk_rows:
+                yield chunk
+                chunk = [header]
+        if len(chunk) > 1:
+            yield chunk
+
+    def iter_matches(self, rows, chunk_rows: int = 5000):
+        """
+        对二维数组或逐行生成器（首行为表头）分块求值，内存占用与表大小无关
+        :return: 生成器，逐块产出满足条件的 DataFrame（index 为数据行的位置，从 0 开始，不含表头）；
+                 表头缺列时抛出 KeyError
+        """
+        offset = 0
+        for chunk in self._iter_chunks(rows, chunk_rows):
+            frame = self._chunk_frame(chunk, self.columns)
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            offset += len(frame)
+            yield self.apply(frame)
+
+    def iter_matching_rows(self, rows, chunk_rows: int = 5000):
+        """
+        与 iter_matches 相同的分块求值，但原样产出满足条件的整行（不含表头），用于筛选后整行写回
+        """
+        condition_columns = sorted(self.condition.columns())
+        for chunk in self._iter_chunks(rows, chunk_rows):
+            mask = self.condition.mask(self._chunk_frame(chunk, condition_columns))
+            yield from compress(chunk[1:], mask)
+
+    def __repr__(self):
+        return f"RowFilter({self.name!r}, {self.condition!r}, output={self.output!r})"
@@ -1,18 +1,38 @@
-import requests
 import webbrowser
 from core.env import SPREADSHEET_TOKEN, SHEET_ID
-def get_table_filter(access_token, spreadsheet_token, sheet_id):
-    url = f"https://open.feishu.cn/open-apis/sheets/v3/spreadsheets/{spreadsheet_token}/sheets/{sheet_id}"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+from modes.feishu.feishu_client import feishu_client
+from modes.filter.filter_engine import RowFilter, col
+from modes.feishu.cell_schema import SAMPLE_SHEET_SCHEMA
+from modes.persistence.metadata_cache import metadata_cache
+
+# 查履约读取的表头所在行（订单号索引中的行号由此推算）
+LVYUE_HEADER_ROW = 1
+# 查履约筛选订单号时实际用到的列
+LVYUE_COLUMNS = ["序号", "履约方式", "订单号"]
+# 有序号、尚未履约、已有订单号的行
+LVYUE_ORDER_FILTER = RowFilter(
+    "查履约",
+    col("序号").not_empty() & col("履约方式").empty() & col("订单号").not_empty(),
+    output=["订单号", "序号"],
+)
+# 读取这些列时的查询参数（由列类型决定，尽量让服务端完成转换）
+LVYUE_RENDER_PARAMS = SAMPLE_SHEET_SCHEMA.render_params(LVYUE_COLUMNS)
+
+def get_table_filter(access_token, spreadsheet_token, sheet_id, use_cache=True):
+    sheet = metadata_cache.get(spreadsheet_token, sheet_id) if use_cache else None
+    if sheet:
+        grid = sheet.get("grid_properties")
+        return f"{sheet_id}!{get_range_str(grid.get('row_count'), grid.get('column_count'))}"
+
+    path = f"sheets/v3/spreadsheets/{spreadsheet_token}/sheets/{sheet_id}"
     try:
-        resp = requests.get(url, headers=headers)
+        resp = feishu_client.get(path, access_token=access_token)
         data = resp.json()
         if data.get("code") == 0:
-            cols = data.get("data").get("sheet").get("grid_properties").get("column_count")
-            rows = data.get("data").get("sheet").get("grid_properties").get("row_count")
+            sheet = data.get("data").get("sheet")
+            metadata_cache.set(spreadsheet_token, sheet, sheet_id=sheet_id)
+            cols = sheet.get("grid_properties").get("column_count")
+            rows = sheet.get("grid_properties").get("row_count")
             return f"{sheet_id}!{get_range_str(rows,cols)}"
         else:
             raise Exception(data.get("msg"))
@@ -20,13 +40,9 @@ def get_table_filter(access_token, spreadsheet_token, sheet_id):
         raise e
 
 def get_table_value(access_token, spreadsheet_token, value_range):
-    url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values/{value_range}"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    path = f"sheets/v2/spreadsheets/{spreadsheet_token}/values/{value_range}"
     try:
-        resp = requests.get(url, headers=headers)
+        resp = feishu_client.get(path, access_token=access_token)
         data = resp.json()
         if data.get("code") == 0:
             return data.get("data").get("valueRange").get("values")
@@ -4,42 +4,101 @@ mode_drive_api.py
 spreadsheetToken
 sheetId
 """
-import requests
-from core.env import SPREADSHEET_TOKEN
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from core.env import SPREADSHEET_TOKEN, FEISHU_MAX_WORKERS
+from modes.feishu.feishu_client import feishu_client, async_feishu_client
+from modes.persistence.metadata_cache import metadata_cache
+from modes.persistence.drive_index import drive_index
 
-def get_spreadsheetToken(access_token, page_size = 50):
-    url = f"https://open.feishu.cn/open-apis/drive/v1/files?"
-    f"page_size={page_size}&user_id_type=user_id"
-
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+def list_folder_files(access_token, folder_token=None, page_size=200):
+    """
+    列出文件夹下的全部文件（自动跟随 page_token 翻页）
+    :param folder_token: 文件夹 token，为空时列出根目录
     """
-        try:
-        resp = requests.get(url, headers=headers)
+    files = []
+    page_token = None
+    while True:
+        params = {"page_size": page_size, "user_id_type": "user_id"}
+        if folder_token:
+            params["folder_token"] = folder_token
+        if page_token:
+            params["page_token"] = page_token
+        resp = feishu_client.get("drive/v1/files", access_token=access_token, params=params)
         data = resp.json()
         code = data.get("code")
-        message = data.get("msg")
-        files = data.get("data").get("files")
-        if code == 0:
+        if code != 0:
+            raise Exception(f"Error code{code}, {data.get('msg')}")
+        files.extend(data.get("data").get("files") or [])
+        page_token = data.get("data").get("next_page_token")
+        if not data.get("data").get("has_more") or not page_token:
             return files
-        else:
-            print(f"Error code{code}, {message}")
-            raise Exception(f"Error code{code}, {message}")
-    except Exception as e:
-        print(e)
-        raise e
+
+
+def crawl_drive(access_token, root_token=None, max_workers=FEISHU_MAX_WORKERS, index=drive_index):
+    """
+    并发遍历云空间，更新本地文件索引
+    修改时间未变化的子文件夹直接沿用索引中的记录，不再请求
+    :return: 索引中的全部文件
     """
-    return [
-        {
-            "name": f"表_{i + 1}",  # i 从 0 开始，所以 +1
-            "parent_token": "fldcnCEG903UUB4fUqfysdabcef",
-            "token": token,
-            "type": "sheet"
-        }
-        for i, token in enumerate(SPREADSHEET_TOKEN)
-    ]
+    files, folders = {}, {}
+    root_key = root_token or ""
+
+    def list_folder(folder_token):
+        return folder_token, list_folder_files(access_token, folder_token)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(list_folder, root_token)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder_token, children = future.result()
+                key = folder_token or root_key
+                parent = folders.setdefault(key, {"modified_time": None, "children": []})
+                for child in children:
+                    token = child.get("token")
+                    files[token] = {
+                        "token": token,
+                        "name": child.get("name"),
+                        "type": child.get("type"),
+                        "modified_time": child.get("modified_time"),
+                        "parent_token": child.get("parent_token") or key,
+                    }
+                    parent["children"].append(token)
+                    if child.get("type") != "folder":
+                        continue
+                    cached = index.get_folder(token)
+                    if cached and cached.get("modified_time") == child.get("modified_time"):
+                        cached_files, cached_folders = index.subtree(token)
+                        files.update(cached_files)
+                        folders.update(cached_folders)
+                    else:
+                        folders[token] = {"modified_time": child.get("modified_time"), "children": []}
+                        pending.add(executor.submit(list_folder, token))
+
+    index.replace(files, folders)
+    return list(files.values())
+
+
+def get_spreadsheetToken(access_token, use_index=False):
+    """
+    获取云空间中的电子表格列表
+    :param use_index: 为 True 时直接返回本地索引，不发起请求
+    """
+    if use_index:
+        files = drive_index.files("sheet")
+    else:
+        files = [f for f in crawl_drive(access_token) if f.get("type") == "sheet"]
+    if not files and SPREADSHEET_TOKEN:
+        # 云空间中没有表格时，回退到 .env 中配置的 SPREADSHEET_TOKEN
+        return [
+            {
+                "name": f"表_{i + 1}",  # i 从 0 开始，所以 +1
+                "token": token,
+                "type": "sheet"
+            }
+            for i, token in enumerate(SPREADSHEET_TOKEN)
+        ]
+    return files
 """
 {
     "code":0,
@@ -73,20 +132,26 @@ def get_spreadsheetToken(access_token, page_size = 50):
 """
 
 
-def get_spreadsheet_Id(access_token, spreadsheet_token):
-    url = f"https://open.feishu.cn/open-apis/sheets/v3/spreadsheets/{spreadsheet_token}/sheets/query"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+def get_spreadsheet_Id(access_token, spreadsheet_token, use_cache=True):
+    """
+    获取表格下所有 sheet 的元数据（sheet_id、title、grid_properties 等）
+    :param use_cache: 是否优先使用元数据缓存
+    """
+    if use_cache:
+        sheets = metadata_cache.get(spreadsheet_token)
+        if sheets is not None:
+            return sheets
+
+    path = f"sheets/v3/spreadsheets/{spreadsheet_token}/sheets/query"
 
     try:
-        resp = requests.get(url, headers=headers)
+        resp = feishu_client.get(path, access_token=access_token)
         data = resp.json()
         code = data.get("code")
         message = data.get("msg")
         sheets = data.get("data").get("sheets")
         if code == 0:
+            metadata_cache.set_sheets(spreadsheet_token, sheets)
             return sheets
         else:
             print(f"Error code{code}, {message}")
@@ -94,6 +159,24 @@ def get_spreadsheet_Id(access_token, spreadsheet_token):
     except Exception as e:
         raise e
 
+
+async def get_spreadsheet_Id_async(access_token, spreadsheet_token, use_cache=True):
+    """get_spreadsheet_Id 的异步版本"""
+    if use_cache:
+        sheets = metadata_cache.get(spreadsheet_token)
+        if sheets is not None:
+            return sheets
+
+    path = f"sheets/v3/spreadsheets/{spreadsheet_token}/sheets/query"
+    resp = await async_feishu_client.get(path, access_token=access_token)
+    data = resp.json()
+    code = data.get("code")
+    if code != 0:
+        raise Exception(f"Error code{code}, {data.get('msg')}")
+    sheets = data.get("data").get("sheets")
+    metadata_cache.set_sheets(spreadsheet_token, sheets)
+    return sheets
+
 """
 {
     "code": 0,
@@ -0,0 +1,67 @@
+# drive_index.py
+"""
+云空间文件索引
+- files: {token: {"token", "name", "type", "modified_time", "parent_token"}}
+- folders: {folder_token: {"modified_time", "children": [子文件 token, ...]}}
+- 基于 Storage 持久化，启动时即可直接填充下拉框
+"""
+from threading import RLock
+from core.env import DRIVE_INDEX_FILE
+from modes.persistence.storage import Storage
+
+
+class DriveIndex:
+    """云空间文件索引"""
+
+    def __init__(self, filename: str = DRIVE_INDEX_FILE):
+        self._storage = Storage(filename)
+        self._lock = RLock()
+
+    def files(self, file_type: str = None) -> list:
+        """索引中的文件列表，可按类型过滤（如 sheet）"""
+        with self._lock:
+            files = list((self._storage.get("files") or {}).values())
+        if file_type:
+            files = [f for f in files if f.get("type") == file_type]
+        return files
+
+    def get_file(self, token):
+        return (self._storage.get("files") or {}).get(token)
+
+    def get_folder(self, folder_token):
+        """文件夹记录 {"modified_time", "children"}，未索引时返回 None"""
+        return (self._storage.get("folders") or {}).get(folder_token)
+
+    def subtree(self, folder_token):
+        """
+        从索引中取出文件夹下的全部文件与子文件夹记录（用于跳过未变化的文件夹）
+        :return: (files, folders)
+        """
+        all_files = self._storage.get("files") or {}
+        all_folders = self._storage.get("folders") or {}
+        files, folders = {}, {}
+        stack = [folder_token]
+        while stack:
+            token = stack.pop()
+            record = all_folders.get(token)
+            if not record or token in folders:
+                continue
+            folders[token] = record
+            for child in record.get("children", []):
+                if child in all_files:
+                    files[child] = all_files[child]
+                    if all_files[child].get("type") == "folder":
+                        stack.append(child)
+        return files, folders
+
+    def replace(self, files: dict, folders: dict):
+        """用一次完整扫描的结果替换索引"""
+        with self._lock:
+            self._storage.update({"files": files, "folders": folders})
+
+    def clear(self):
+        self._storage.clear()
+
+
+# 全局索引实例
+drive_index = DriveIndex()
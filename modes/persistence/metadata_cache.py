@@ -0,0 +1,95 @@
+# metadata_cache.py
+"""
+飞书表格元数据缓存
+- 按 spreadsheet_token / sheet_id 缓存表格的 sheet 列表与行列信息
+- TTL 过期淘汰
+- 基于 Storage 持久化，重启后仍然有效
+"""
+import time
+from threading import RLock
+from core.env import METADATA_STORE_FILE, METADATA_CACHE_TTL
+from modes.persistence.storage import Storage
+
+
+class MetadataCache:
+    """带 TTL 的元数据缓存"""
+
+    def __init__(self, filename: str = METADATA_STORE_FILE, ttl: int = METADATA_CACHE_TTL):
+        self.ttl = ttl
+        self._storage = Storage(filename)
+        self._lock = RLock()
+        self._evict_expired()
+
+    @staticmethod
+    def make_key(spreadsheet_token, sheet_id=None) -> str:
+        return f"{spreadsheet_token}:{sheet_id}" if sheet_id else spreadsheet_token
+
+    def _evict_expired(self):
+        """启动时清理已过期的条目"""
+        now = time.time()
+        with self._lock:
+            entries = self._storage.all()
+            alive = {
+                key: entry for key, entry in entries.items()
+                if isinstance(entry, dict) and entry.get("expires_at", 0) > now
+            }
+            if len(alive) != len(entries):
+                self._storage.clear()
+                self._storage.update(alive)
+
+    def get(self, spreadsheet_token, sheet_id=None):
+        """
+        读取缓存
+        :param sheet_id: 为空时读取整个表格的 sheet 列表，否则读取单个 sheet 的元数据
+        :return: 缓存的值，不存在或已过期时返回 None
+        """
+        key = self.make_key(spreadsheet_token, sheet_id)
+        with self._lock:
+            entry = self._storage.get(key)
+            if not entry:
+                return None
+            if entry.get("expires_at", 0) <= time.time():
+                self._storage.delete(key)
+                return None
+            return entry.get("value")
+
+    def _entry(self, value, ttl: int = None) -> dict:
+        return {"value": value, "expires_at": time.time() + (ttl if ttl is not None else self.ttl)}
+
+    def set(self, spreadsheet_token, value, sheet_id=None, ttl: int = None):
+        with self._lock:
+            self._storage.set(self.make_key(spreadsheet_token, sheet_id), self._entry(value, ttl))
+
+    def set_sheets(self, spreadsheet_token, sheets):
+        """缓存 sheets/query 的结果，同时按 sheet_id 缓存每个 sheet 的元数据"""
+        entries = {self.make_key(spreadsheet_token): self._entry(sheets)}
+        for sheet in sheets or []:
+            if "sheet_id" in sheet:
+                entries[self.make_key(spreadsheet_token, sheet["sheet_id"])] = self._entry(sheet)
+        with self._lock:
+            self._storage.update(entries)
+
+    def invalidate(self, spreadsheet_token=None, sheet_id=None):
+        """
+        手动失效
+        - 不传参数：清空全部缓存
+        - 只传 spreadsheet_token：失效该表格及其所有 sheet
+        - 同时传 sheet_id：只失效单个 sheet
+        """
+        with self._lock:
+            if spreadsheet_token is None:
+                self._storage.clear()
+            elif sheet_id:
+                self._storage.delete(self.make_key(spreadsheet_token, sheet_id))
+            else:
+                prefix = f"{spreadsheet_token}:"
+                kept = {
+                    key: entry for key, entry in self._storage.all().items()
+                    if key != spreadsheet_token and not key.startswith(prefix)
+                }
+                self._storage.clear()
+                self._storage.update(kept)
+
+
+# 全局缓存实例
+metadata_cache = MetadataCache()
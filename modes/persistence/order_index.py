@@ -0,0 +1,150 @@
+# order_index.py
+"""
+跨表订单号索引
+- 订单号 → (spreadsheet_token, sheet_id, 行号, 序号)，内存中为字典，查找 O(1)
+- 查履约提取订单号时同步建立：重复出现的订单号只保留第一次（跨月表重复时不会被重复处理）
+  本次提取中已出现的，以及索引中已记录在其他（本次未重新提取的）表里的订单号都视为重复
+- 按列压缩保存为 NumPy 文件（编码方式与表数据快照相同），写入临时文件后原子替换
+"""
+import os
+from threading import RLock
+import numpy as np
+from core.env import PERSISTENCE_DIR, ORDER_INDEX_FILE
+from core.logger import logger
+from modes.persistence.snapshot_store import encode_column, decode_column
+
+FIELDS = ("order", "spreadsheet_token", "sheet_id", "row", "seq")
+
+
+def order_key(value):
+    """订单号统一为去掉首尾空白的字符串（1.0 这类整数浮点数去掉小数部分），空值返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = str(value).strip()
+    return key or None
+
+
+class OrderIndex:
+    """订单号索引"""
+
+    def __init__(self, filename: str = ORDER_INDEX_FILE):
+        self.filepath = PERSISTENCE_DIR / filename
+        self._lock = RLock()
+        self._orders = self._load_file()   # {订单号: (spreadsheet_token, sheet_id, row, seq)}
+
+    def _load_file(self) -> dict:
+        if not self.filepath.exists():
+            return {}
+        try:
+            with np.load(self.filepath, allow_pickle=False) as npz:
+                length = int(npz["length"])
+                columns = [
+                    decode_column(str(npz[f"{field}_kind"]), {
+                        name: npz[f"{field}_{name}"] for name in ("data", "uniques", "mask")
+                        if f"{field}_{name}" in npz.files
+                    }, length).tolist()
+                    for field in FIELDS
+                ]
+            return {order: location for order, *location in zip(*columns)}
+        except Exception as e:
+            logger.warning(f"订单号索引读取失败，将重新建立: {e}")
+            return {}
+
+    def _save_file(self):
+        arrays = {"length": np.array(len(self._orders))}
+        columns = zip(*((order, *location) for order, location in self._orders.items())) if self._orders \
+            else [[] for _ in FIELDS]
+        for field, values in zip(FIELDS, columns):
+            kind, encoded = encode_column(list(values))
+            arrays[f"{field}_kind"] = np.array(kind)
+            arrays.update({f"{field}_{name}": array for name, array in encoded.items()})
+        tmp_path = self.filepath.with_name(f"{self.filepath.name}.{os.getpid()}.tmp.npz")
+        try:
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, self.filepath)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order):
+        return order_key(order) in self._orders
+
+    def get(self, order):
+        """订单号所在位置 {"order", "spreadsheet_token", "sheet_id", "row", "seq"}，不存在时返回 None"""
+        key = order_key(order)
+        location = self._orders.get(key)
+        return dict(zip(FIELDS, (key, *location))) if location else None
+
+    def batch(self, spreadsheet_token, sheet_ids=()) -> "OrderIndexBatch":
+        """
+        开始一次提取：插入时去重，commit 后写入索引
+        :param sheet_ids: 本次要重新提取的 sheet，这些 sheet 在索引中的旧记录不参与去重
+        """
+        return OrderIndexBatch(self, spreadsheet_token, sheet_ids)
+
+    def replace_sheets(self, spreadsheet_token, sheet_ids, entries: dict):
+        """
+        用新提取的结果替换这些 sheet 的索引记录并保存
+        :param entries: {订单号: (sheet_id, row, seq)}
+        """
+        sheet_ids = set(sheet_ids)
+        with self._lock:
+            self._orders = {
+                order: location for order, location in self._orders.items()
+                if not (location[0] == spreadsheet_token and location[1] in sheet_ids)
+            }
+            for order, (sheet_id, row, seq) in entries.items():
+                self._orders[order] = (spreadsheet_token, sheet_id, row, seq)
+            self._save_file()
+
+    def clear(self):
+        with self._lock:
+            self._orders = {}
+            self._save_file()
+
+
+class OrderIndexBatch:
+    """一次提取中的订单号：插入时去重"""
+
+    def __init__(self, index: OrderIndex, spreadsheet_token, sheet_ids=()):
+        self.index = index
+        self.spreadsheet_token = spreadsheet_token
+        self.sheet_ids = set(sheet_ids)
+        self.entries = {}   # {订单号: (sheet_id, row, seq)}
+        self.duplicates = 0
+
+    def add(self, order, sheet_id, row, seq=None):
+        """
+        :return: 首次出现时返回规范化后的订单号，重复或为空时返回 None
+        """
+        key = order_key(order)
+        if key is None:
+            return None
+        if key in self.entries or self._indexed_elsewhere(key):
+            self.duplicates += 1
+            return None
+        self.entries[key] = (sheet_id, row, seq)
+        return key
+
+    def _indexed_elsewhere(self, key) -> bool:
+        """索引中已记录在其他表格，或本次未重新提取的 sheet 中"""
+        location = self.index._orders.get(key)
+        return location is not None and (
+            location[0] != self.spreadsheet_token or location[1] not in self.sheet_ids
+        )
+
+    def commit(self, sheet_ids):
+        """
+        保存索引
+        :param sheet_ids: 本次成功提取的 sheet，只替换这些 sheet 的旧记录（失败的 sheet 保留原有索引）
+        """
+        self.index.replace_sheets(self.spreadsheet_token, sheet_ids, self.entries)
+
+
+# 全局订单号索引
+order_index = OrderIndex()
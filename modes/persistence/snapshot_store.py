@@ -0,0 +1,200 @@
+# snapshot_store.py
+"""
+表数据快照存储（列式）
+- 每个 sheet 的数据按列保存为压缩的 NumPy 文件（np.savez_compressed），每 PART_ROWS 行一个分片
+- 每列带类型标记：int / float / bool / str / json（混合类型、富文本等）/ null，空值单独用掩码保存
+- 字符串按列字典编码（不重复的值 + 整数编码），重复的 BD、店铺名等只存一份
+- manifest 按 spreadsheet_token / sheet_id 记录 revision、列投影、表头、行数与数据目录
+- 写入先落到新的数据目录，写完后才更新 manifest，中途失败不会影响旧快照
+"""
+import json
+import shutil
+import uuid
+from itertools import islice
+from pathlib import Path
+from threading import RLock
+import numpy as np
+import pandas as pd
+from core.env import PERSISTENCE_DIR
+from modes.persistence.storage import Storage
+from modes.feishu.fast_decode import header_names
+
+# 每个分片的行数：流式写入时只在内存中保留一个分片
+PART_ROWS = 50000
+
+
+def encode_column(values: list):
+    """
+    单列编码
+    :return: (类型标记, {数组名: 数组})
+    """
+    nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    present = [v for v in values if v is not None]
+    types = set(map(type, present))
+    arrays = {"mask": nulls} if nulls.any() else {}
+    if not types:
+        return "null", {}
+    if types == {bool}:
+        kind, data = "bool", np.array([bool(v) for v in values], dtype=bool)
+    elif types == {int} and all(-2 ** 63 <= v < 2 ** 63 for v in present):
+        kind, data = "int", np.array([v if v is not None else 0 for v in values], dtype=np.int64)
+    elif types == {float}:
+        kind, data = "float", np.array([v if v is not None else np.nan for v in values], dtype=np.float64)
+    else:
+        # 字符串字典编码；其他类型（混合、列表等）先转为 JSON 文本再编码
+        kind = "str" if types == {str} else "json"
+        encode = (lambda v: v) if kind == "str" else (lambda v: json.dumps(v, ensure_ascii=False, default=str))
+        memo = {}
+        codes = np.fromiter(
+            (memo.setdefault(encode(v), len(memo)) if v is not None else 0 for v in values),
+            dtype=np.int32, count=len(values),
+        )
+        arrays["uniques"] = np.array(list(memo), dtype=str) if memo else np.array([], dtype=str)
+        data = codes
+    arrays["data"] = data
+    return kind, arrays
+
+
+def decode_column(kind: str, arrays: dict, length: int) -> np.ndarray:
+    """解码为 object 数组（Python 原生类型，空值为 None）"""
+    if kind == "null":
+        return np.full(length, None, dtype=object)
+    data = arrays["data"]
+    if kind in ("str", "json"):
+        uniques = arrays["uniques"].tolist()
+        if kind == "json":
+            uniques = [json.loads(u) for u in uniques]
+        lookup = np.empty(len(uniques), dtype=object)
+        lookup[:] = uniques
+        column = lookup[data] if len(uniques) else np.full(length, None, dtype=object)
+    else:
+        column = data.astype(object)
+    mask = arrays.get("mask")
+    if mask is not None:
+        column[mask] = None
+    return column
+
+
+class SnapshotStore:
+    """按 spreadsheet_token / sheet_id 存储表数据快照"""
+
+    def __init__(self, directory: Path = PERSISTENCE_DIR / "snapshots"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._manifest = Storage(self.directory / "manifest.json")
+        self._lock = RLock()
+
+    @staticmethod
+    def _key(spreadsheet_token, sheet_id) -> str:
+        return f"{spreadsheet_token}/{sheet_id}"
+
+    def get_meta(self, spreadsheet_token, sheet_id):
+        """读取快照元信息 {"revision", "columns", "header", "rows", ...}，快照不存在时返回 None"""
+        meta = self._manifest.get(self._key(spreadsheet_token, sheet_id))
+        if not meta or not (self.directory / meta["path"]).exists():
+            return None
+        return meta
+
+    def _iter_parts(self, meta):
+        """逐个分片解码，产出 [列数组, ...]"""
+        folder = self.directory / meta["path"]
+        for idx, part_rows in enumerate(meta["parts"]):
+            with np.load(folder / f"part-{idx:05d}.npz", allow_pickle=False) as npz:
+                yield [
+                    decode_column(kind, {name: npz[f"c{col}_{name}"] for name in names}, part_rows)
+                    for col, (kind, names) in enumerate(meta["kinds"][idx])
+                ]
+
+    def iter_rows(self, spreadsheet_token, sheet_id):
+        """逐行读取快照（首行为表头），内存中只保留一个分片"""
+        meta = self.get_meta(spreadsheet_token, sheet_id)
+        if meta is None:
+            raise FileNotFoundError(f"快照不存在: {self._key(spreadsheet_token, sheet_id)}")
+        yield list(meta["header"])
+        for columns in self._iter_parts(meta):
+            yield from map(list, zip(*columns))
+
+    def load_frame(self, spreadsheet_token, sheet_id, columns=None) -> pd.DataFrame:
+        """
+        快照直接加载为 DataFrame（列名为表头），不经过逐行转换，筛选可以直接在列上进行
+        :param columns: 只保留这些列
+        """
+        meta = self.get_meta(spreadsheet_token, sheet_id)
+        if meta is None:
+            raise FileNotFoundError(f"快照不存在: {self._key(spreadsheet_token, sheet_id)}")
+        names = header_names(meta["header"])
+        width = max([len(names)] + [len(kinds) for kinds in meta["kinds"]])
+        names += [f"列{idx}" for idx in range(len(names) + 1, width + 1)]
+        parts = list(self._iter_parts(meta))
+        frame = {}
+        for idx, name in enumerate(names):
+            if columns is not None and name not in columns:
+                continue
+            chunks = [part[idx] if idx < len(part) else np.full(rows, None, dtype=object)
+                      for part, rows in zip(parts, meta["parts"])]
+            frame[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=object)
+        return pd.DataFrame(frame)
+
+    def write_rows(self, spreadsheet_token, sheet_id, revision, rows, columns=None):
+        """
+        边写快照边产出数据行（rows 首行为表头）
+        只有 rows 被完整消费后快照才会生效；中途放弃时新写入的分片会被删除
+        :return: 生成器，原样产出 rows 中的每一行
+        """
+        folder = Path(spreadsheet_token) / f"{sheet_id}-{uuid.uuid4().hex[:8]}"
+        path = self.directory / folder
+        path.mkdir(parents=True, exist_ok=True)
+        rows = iter(rows)
+        header = next(rows, None)
+        completed = False
+        try:
+            if header is None:
+                return
+            yield header
+            parts, kinds = [], []
+            while True:
+                chunk = list(islice(rows, PART_ROWS))
+                if not chunk:
+                    break
+                kinds.append(self._write_part(path / f"part-{len(parts):05d}.npz", chunk))
+                parts.append(len(chunk))
+                yield from chunk
+            meta = {
+                "revision": revision, "columns": columns, "header": list(header),
+                "rows": sum(parts), "parts": parts, "kinds": kinds, "path": folder.as_posix(),
+            }
+            with self._lock:
+                old = self._manifest.get(self._key(spreadsheet_token, sheet_id))
+                self._manifest.set(self._key(spreadsheet_token, sheet_id), meta)
+            if old:
+                shutil.rmtree(self.directory / old["path"], ignore_errors=True)
+            completed = True
+        finally:
+            if not completed:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _write_part(path: Path, chunk) -> list:
+        """写入一个分片，返回每列的 (类型标记, 数组名列表)"""
+        width = max(map(len, chunk))
+        arrays, kinds = {}, []
+        for col in range(width):
+            kind, encoded = encode_column([row[col] if col < len(row) else None for row in chunk])
+            kinds.append((kind, list(encoded)))
+            arrays.update({f"c{col}_{name}": array for name, array in encoded.items()})
+        np.savez_compressed(path, **arrays)
+        return kinds
+
+    def save(self, spreadsheet_token, sheet_id, revision, rows, columns=None):
+        """一次性保存完整的快照"""
+        for _ in self.write_rows(spreadsheet_token, sheet_id, revision, rows, columns):
+            pass
+
+    def delete(self, spreadsheet_token, sheet_id=None):
+        """删除单个 sheet 或整个表格的快照"""
+        with self._lock:
+            prefix = self._key(spreadsheet_token, sheet_id) if sheet_id else f"{spreadsheet_token}/"
+            for key, meta in self._manifest.all().items():
+                if key == prefix or (not sheet_id and key.startswith(prefix)):
+                    self._manifest.delete(key)
+                    shutil.rmtree(self.directory / meta["path"], ignore_errors=True)
@@ -40,6 +40,12 @@ class Storage:
             self._data[key] = value
             self._save_file()
 
+    def update(self, mapping: dict):
+        """批量写入，只落盘一次"""
+        with self._lock:
+            self._data.update(mapping)
+            self._save_file()
+
     def delete(self, key):
         with self._lock:
             if key in self._data:
@@ -0,0 +1,63 @@
+# test_excel_filter_rows.py
+"""ExcelTool.filter_rows：比表头更宽的行要整行保留"""
+import openpyxl
+from modes.excel.excel_tool import ExcelTool
+from modes.filter.filter_engine import RowFilter, col
+
+ROWS = [["a", "b"], [1, 2, 3], [None, 5, 6], [7, 8, 9]]
+KEEP_A = RowFilter("a 非空", col("a").not_empty())
+
+
+def _make_managed_file(path):
+    """由 ExcelTool 生成（write-only，文件中没有准确的维度信息，只能按行读取宽度）"""
+    tool = ExcelTool(file_name=str(path))
+    tool.write_sheet_rows("S", ROWS[1:], headers=ROWS[0])
+    return ExcelTool(file_name=str(path), managed=True)
+
+
+def _make_file(path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "S"
+    for row in ROWS:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def _read(path, sheet_name="S"):
+    workbook = openpyxl.load_workbook(path)
+    return [tuple(row) for row in workbook[sheet_name].iter_rows(values_only=True)]
+
+
+def test_filter_rows_keeps_columns_beyond_header_managed(tmp_path):
+    path = tmp_path / "managed.xlsx"
+    tool = _make_managed_file(path)
+
+    counts = tool.filter_rows("S", KEEP_A)
+
+    assert counts == {"total": 3, "matched": 2, "removed": 1}
+    assert _read(path) == [("a", "b", None), (1, 2, 3), (7, 8, 9)]
+
+
+def test_filter_rows_keeps_columns_beyond_header_loaded(tmp_path):
+    path = tmp_path / "user.xlsx"
+    _make_file(path)
+    tool = ExcelTool(file_name=str(path))
+    assert not tool.managed
+    tool.workbook  # 已加载时走内存中的工作簿
+
+    tool.filter_rows("S", KEEP_A)
+
+    assert _read(path) == [("a", "b", None), (1, 2, 3), (7, 8, 9)]
+    assert list(tool.iter_sheet_values("S")) == [("a", "b", None), (1, 2, 3), (7, 8, 9)]
+
+
+def test_filter_rows_to_new_file_keeps_full_rows(tmp_path):
+    path = tmp_path / "source.xlsx"
+    output = tmp_path / "output.xlsx"
+    tool = _make_managed_file(path)
+
+    tool.filter_rows("S", KEEP_A, output_path=output)
+
+    assert _read(output) == [("a", "b", None), (1, 2, 3), (7, 8, 9)]
+    assert _read(path) == [("a", "b", None), (1, 2, 3), (None, 5, 6), (7, 8, 9)]
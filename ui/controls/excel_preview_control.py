@@ -1,11 +1,20 @@
-from core.env import EXCEL_DIR
-from datetime import datetime
-from modes.mode_cha_lvyue import get_table_filter
-from modes.mode_cha_lvyue import get_table_value
+from core.env import EXCEL_DIR, FEISHU_MAX_WORKERS
+from modes.mode_cha_lvyue import LVYUE_COLUMNS, LVYUE_HEADER_ROW, LVYUE_ORDER_FILTER, LVYUE_RENDER_PARAMS
+from modes.mode_drive_api import get_spreadsheet_Id_async
+from modes.feishu.feishu_sheet import batch_get_projected_async, iter_sheet_rows, STREAM_WINDOW_ROWS
+from modes.feishu.sheet_sync import sheet_sync
+from modes.feishu.fast_decode import header_names
+from modes.feishu.cell_schema import SAMPLE_SHEET_SCHEMA
+from modes.persistence.order_index import order_index
+from modes.filter.filter_engine import RowFilter, All, col
 from core.logger import logger
 from modes.excel.excel_tool import ExcelTool
+from ui.controls.paged_data_table import PagedDataTable
 from pathlib import Path
 import flet as ft
+import pandas as pd
+from itertools import chain, islice
+import asyncio
 import os
 
 
@@ -25,6 +34,11 @@ class ExcelPreviewControl(ft.Column):
         self.scrollable_table = None
         self.open_button = None
         self.apply_filter_button = None
+        # 剔除空值对话框与列复选框
+        self.filter_dialog = None
+        self.filter_checkboxes = {}
+        # 上次渲染的工作表版本（ExcelTool.sheet_state）
+        self._rendered_state = None
 
         # 添加对话框和复选框存储
         self.sheet_selection_dialog = None
@@ -41,14 +55,8 @@ class ExcelPreviewControl(ft.Column):
             value=self.excel_tool.get_sheet_names()[0] if self.excel_tool.get_sheet_names() else None
         )
 
-        self.data_table = ft.DataTable(
-            columns=[],
-            rows=[],
-            border=ft.border.all(1, ft.Colors.GREY_400),
-            heading_row_color=ft.Colors.GREY_200,
-            expand=True,
-            column_spacing=10,
-        )
+        # 分页表格：只渲染当前页的行
+        self.data_table = PagedDataTable(self._page)
 
         # 使用传入的 page 引用
         self.file_picker = ft.FilePicker(on_result=self.on_file_picked)
@@ -81,6 +89,18 @@ class ExcelPreviewControl(ft.Column):
             icon=ft.Icons.FOLDER_OPEN
         )
 
+        self.order_search = ft.TextField(
+            label="查找订单号",
+            width=200,
+            on_submit=self.on_order_search,
+        )
+
+        self.apply_filter_button = ft.ElevatedButton(
+            text="剔除空值行",
+            on_click=self.show_filter_dialog,
+            icon=ft.Icons.FILTER_ALT
+        )
+
         self.open_button = ft.ElevatedButton(
             text="打开 Excel 文件",
             on_click=self.open_excel_file,
@@ -88,23 +108,15 @@ class ExcelPreviewControl(ft.Column):
         )
 
         self.scrollable_table = ft.Container(
-            content=ft.Column(
-                controls=[
-                    ft.Row(
-                        scroll=ft.ScrollMode.ALWAYS,
-                        controls=[self.data_table],
-                    )
-                ],
-                scroll=ft.ScrollMode.ALWAYS,
-                expand=True,
-            )
+            content=self.data_table,
+            expand=True,
         )
 
         # 设置 Column 的 controls
         self.controls = [
             ft.Row(
                 [self.sheet_dropdown, self.select_file_button, self.refresh_button,
-                 self.open_button, self.remote_load_btn],
+                 self.open_button, self.apply_filter_button, self.remote_load_btn, self.order_search],
                 alignment=ft.MainAxisAlignment.CENTER,
                 spacing=10
             ),
@@ -240,74 +252,129 @@ class ExcelPreviewControl(ft.Column):
         # 关闭对话框
         self.close_dialog(e)
 
-        # 调用加载方法
-        self.on_load_data_from_remote(selected_sheets)
+        # 在 Flet 事件循环中异步加载，不阻塞 UI
+        self._page.run_task(self.on_load_data_from_remote_async, selected_sheets)
 
-    def on_load_data_from_remote(self, selected_sheets):
-        """从远程加载数据（根据用户选择的表）"""
+    def _get_remote_load_context(self, selected_sheets):
+        """检查远程加载的前置条件，返回 (token, spreadsheets_token)，不满足时返回 None"""
         main_app = self._page.data.get("main_app") if hasattr(self._page, "data") else None
         if not main_app:
             self._page.snack_bar = ft.SnackBar(ft.Text("无法找到主应用实例 ❌"))
             self._page.snack_bar.open = True
             self._page.update()
             print(f"无法找到主应用实例")
-            return
+            return None
 
         if not selected_sheets:
             self._page.snack_bar = ft.SnackBar(ft.Text("未选择任何表 ⚠️"))
             self._page.snack_bar.open = True
             self._page.update()
-            return
+            return None
 
         token = main_app.token_storage.get("user_token")
         spreadsheets_token = main_app.sheet_storage.get("spreadsheets")
+        return token, spreadsheets_token
 
+    async def on_load_data_from_remote_async(self, selected_sheets):
+        """
+        从远程加载数据（根据用户选择的表），通过 page.run_task 运行
+        增量同步：未变化的表读本地快照，其余批量拉取（values_batch_get），结果按 selected_sheets 的顺序合并
+        """
+        context = self._get_remote_load_context(selected_sheets)
+        if not context:
+            return
+        token, spreadsheets_token = context
+
+        try:
+            results = await sheet_sync.sync_async(
+                token, spreadsheets_token, selected_sheets,
+                lambda sheet_ids: self._fetch_sheets_values_async(token, spreadsheets_token, sheet_ids),
+                columns=LVYUE_COLUMNS,
+            )
+        except Exception as ex:
+            results = [ex] * len(selected_sheets)
+
+        # 筛选可能需要继续流式读取大表，放到线程中执行
         codelist = [["订单号"]]
-        total_count = 0
+        total_count = await asyncio.to_thread(
+            self._extract_orders, spreadsheets_token, selected_sheets, results, codelist
+        )
+        await self._finish_remote_load(codelist, total_count)
 
-        for sheet_id in selected_sheets:
+    @staticmethod
+    def _extract_orders(spreadsheets_token, selected_sheets, results, codelist):
+        """
+        从各表数据中筛选订单号，追加到 codelist，同时建立订单号索引
+        多个表中重复出现的订单号只追加第一次；索引中已记录在其他表（本次未重新提取）的订单号同样跳过
+        :return: 提取的总条数（去重后）
+        """
+        total_count = 0
+        batch = order_index.batch(spreadsheets_token, selected_sheets)
+        indexed_sheets = []
+        for sheet_id, values in zip(selected_sheets, results):
             try:
-                value_range = get_table_filter(token, spreadsheets_token, sheet_id)
-                print(f"获取表数据成功:范围=> {value_range}")
-                logger.success(f"获取表数据成功:范围=> {value_range}")
-
-                values = get_table_value(token, spreadsheets_token, value_range)
-                if not values or len(values) < 2:
+                if isinstance(values, Exception):
+                    raise values
+                # values 可能是本地快照的 DataFrame、二维数组或大表的流式行生成器
+                if isinstance(values, pd.DataFrame):
+                    header, names, rows = list(values.columns), list(values.columns), None
+                else:
+                    rows = iter(values or [])
+                    header = next(rows, None)
+                    names = header_names(header)
+                if not header:
                     logger.warning(f"{sheet_id} 表数据为空或无效")
                     continue
-                header = values[0]
-                # 必须同时存在"序号"和"履约方式"
-                if "序号" not in header or "履约方式" not in header or "订单号" not in header:
+                # 必须同时存在"序号"、"履约方式"和"订单号"
+                if LVYUE_ORDER_FILTER.missing_columns(names):
                     logger.warning(f"{sheet_id} 表头不含关键列，跳过：{header}")
                     continue
 
-                idx_xh = header.index("序号")
-                idx_ly = header.index("履约方式")
-                idx_order = header.index("订单号")
+                # 快照已是列式数据，直接整表筛选；其余按块向量化筛选
                 i = 0
-                for row in values[1:]:
-                    try:
-                        xh = row[idx_xh] if idx_xh < len(row) else None
-                        ly = row[idx_ly] if idx_ly < len(row) else None
-                        order = row[idx_order] if idx_order < len(row) else None
-
-                        if xh not in (None, "", "null") and ly in (None, "", "null") and order not in (
-                        None, "", "null"):
-                            codelist.append([order])
-                            i = i + 1
-                    except Exception as row_ex:
-                        logger.warning(f"解析行时出错：{row_ex} => {row}")
-
+                if rows is None:
+                    matches = [LVYUE_ORDER_FILTER.apply(values)]
+                else:
+                    matches = LVYUE_ORDER_FILTER.iter_matches(chain([header], rows), chunk_rows=STREAM_WINDOW_ROWS)
+                duplicates = batch.duplicates
+                for matched in matches:
+                    # index 为数据行位置（从表头下一行开始计数）
+                    for pos, order, seq in zip(matched.index, matched["订单号"].tolist(), matched["序号"].tolist()):
+                        key = batch.add(order, sheet_id, LVYUE_HEADER_ROW + 1 + int(pos), seq)
+                        if key is not None:
+                            codelist.append([key])
+                            i += 1
                 total_count += i
-                logger.success(f"{sheet_id} ✅筛选完成，共提取 {i} 条")
+                indexed_sheets.append(sheet_id)
+                logger.success(f"{sheet_id} ✅筛选完成，共提取 {i} 条，跳过重复订单号 {batch.duplicates - duplicates} 条")
 
             except Exception as ex:
-                print(f"获取表数据失败: {ex}")
-                logger.error(f"获取表数据失败: {ex}")
+                print(f"获取表数据失败: {sheet_id} => {ex}")
+                logger.error(f"获取表数据失败: {sheet_id} => {ex}")
+        try:
+            batch.commit(indexed_sheets)
+        except Exception as ex:
+            logger.error(f"保存订单号索引失败: {ex}")
+        return total_count
 
+    def on_order_search(self, e):
+        """在订单号索引中查找订单所在的表和行"""
+        order = (self.order_search.value or "").strip()
+        if not order:
+            return
+        location = order_index.get(order)
+        if location:
+            msg = f"订单号 {order}：表 {location['sheet_id']} 第 {location['row']} 行，序号 {location['seq']}"
+        else:
+            msg = f"未找到订单号 {order}"
+        self._page.snack_bar = ft.SnackBar(ft.Text(msg), open=True)
+        self._page.update()
+
+    async def _finish_remote_load(self, codelist, total_count):
+        """写入筛选结果并刷新预览；类型转换、整表重建与读取预览数据都在线程中进行，不阻塞 Flet 事件循环"""
         try:
-            self.write_table_data(codelist)
-            self.update_table(self.sheet_dropdown.value)
+            await asyncio.to_thread(self.write_table_data, codelist)
+            await self.update_table_async(self.sheet_dropdown.value)
             self._page.snack_bar = ft.SnackBar(
                 ft.Text(f"✅ 成功加载 {total_count} 条数据"),
                 open=True
@@ -321,55 +388,97 @@ class ExcelPreviewControl(ft.Column):
             )
             self._page.update()
 
+    @staticmethod
+    def _plan_sheet_fetch(token, spreadsheets_token, selected_sheets, sheets):
+        """
+        根据 sheets/query 的结果规划读取方式
+        超过一个窗口的大表改为按行窗口流式读取，由调用方逐行消费
+        :return: (results, 需要批量投影读取的 items, items 对应的位置)
+        """
+        grid = {s["sheet_id"]: s.get("grid_properties") or {} for s in sheets if "sheet_id" in s}
+
+        results = [None] * len(selected_sheets)
+        items, positions = [], []
+        for pos, sheet_id in enumerate(selected_sheets):
+            props = grid.get(sheet_id)
+            if not props:
+                results[pos] = Exception(f"未找到表 {sheet_id} 的行列信息")
+                continue
+            row_count, column_count = props.get("row_count"), props.get("column_count")
+            logger.info(f"获取表范围成功:{sheet_id} => {row_count}行 {column_count}列")
+            if row_count > STREAM_WINDOW_ROWS:
+                results[pos] = iter_sheet_rows(
+                    token, spreadsheets_token, sheet_id, row_count, column_count, columns=LVYUE_COLUMNS,
+                    header_row=LVYUE_HEADER_ROW, params=LVYUE_RENDER_PARAMS
+                )
+                continue
+            items.append((spreadsheets_token, sheet_id, row_count, column_count))
+            positions.append(pos)
+        return results, items, positions
+
+    @classmethod
+    async def _fetch_sheets_values_async(cls, token, spreadsheets_token, selected_sheets):
+        """
+        拉取多个表中查履约需要的列，各批次请求并发进行
+        一次 sheets/query 获取所有表的行列数，再按表头只读取 LVYUE_COLUMNS 对应的列
+        :return: 与 selected_sheets 顺序一致的列表，单项为二维数组、行生成器或 Exception
+        """
+        sheets = await get_spreadsheet_Id_async(token, spreadsheets_token)
+        results, items, positions = cls._plan_sheet_fetch(token, spreadsheets_token, selected_sheets, sheets)
+        projected = await batch_get_projected_async(
+            token, items, LVYUE_COLUMNS, header_row=LVYUE_HEADER_ROW, max_concurrency=FEISHU_MAX_WORKERS,
+            params=LVYUE_RENDER_PARAMS
+        )
+        for pos, values in zip(positions, projected):
+            results[pos] = values
+        return results
+
     def update_table(self, sheet_name: str):
         if not sheet_name:
-            self.data_table.columns = []
-            self.data_table.rows = []
+            self.data_table.clear()
+            self._rendered_state = None
             self._page.update()
             return
 
-        self.excel_tool.workbook = self.excel_tool.load_workbook(self.excel_tool.file_path) if os.path.exists(
-            self.excel_tool.file_path) else self.excel_tool.create_workbook()
-        sheet = self.excel_tool.get_sheet(sheet_name)
-        row_count = self.excel_tool.get_row_count(sheet)
-        col_count = self.excel_tool.get_column_count(sheet)
+        self._render_table(self._read_table(sheet_name))
 
-        headers = self.excel_tool.default_headers if self.excel_tool.check_headers(sheet) else [
-            sheet.cell(row=self.excel_tool.header_row, column=col).value or f"Column {col}"
-            for col in range(1, col_count + 1)
-        ]
+    async def update_table_async(self, sheet_name: str):
+        """update_table 的异步版本：读取文件在线程中进行，只有渲染在事件循环中进行"""
+        if not sheet_name:
+            self.update_table(sheet_name)
+            return
+        self._render_table(await asyncio.to_thread(self._read_table, sheet_name))
 
-        self.data_table.columns = [
-            ft.DataColumn(
-                ft.Text(
-                    header,
-                    weight=ft.FontWeight.BOLD,
-                    text_align=ft.TextAlign.CENTER,
-                )
-            )
-            for header in headers
+    def _read_table(self, sheet_name: str):
+        """
+        读取预览需要的数据
+        :return: 自上次渲染后没有写入或外部修改时返回 None（直接复用已渲染的表格），否则返回 (state, headers, rows)
+        """
+        # 只有文件被外部修改时才重新加载
+        self.excel_tool.refresh()
+        state = self.excel_tool.sheet_state(sheet_name)
+        if state == self._rendered_state:
+            return None
+
+        rows = self.excel_tool.iter_sheet_values(sheet_name)
+        # 跳过表头之上的行
+        for _ in range(self.excel_tool.header_row - 1):
+            next(rows, None)
+        header_values = list(next(rows, None) or [])
+
+        headers = self.excel_tool.default_headers \
+            if header_values[:len(self.excel_tool.default_headers)] == self.excel_tool.default_headers else [
+            value or f"Column {col}" for col, value in enumerate(header_values, start=1)
         ]
 
-        if row_count > self.excel_tool.header_row:
-            data = self.excel_tool.read_range(
-                sheet, self.excel_tool.header_row + 1, 1, row_count, col_count, skip_headers=True
-            )
-            self.data_table.rows = [
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(
-                            ft.Text(
-                                str(cell) if cell is not None else "",
-                                text_align=ft.TextAlign.CENTER
-                            ),
-                        ) for cell in row
-                    ]
-                )
-                for row in data
-            ]
-        else:
-            self.data_table.rows = []
+        return state, headers, list(rows)
 
+    def _render_table(self, table):
+        if table is not None:
+            state, headers, rows = table
+            # 数据按列保存，只渲染第一页
+            self.data_table.set_data(headers, rows)
+            self._rendered_state = state
         self._page.update()
 
     def write_table_data(self, data):
@@ -378,15 +487,6 @@ class ExcelPreviewControl(ft.Column):
         :param data: 可以是 list 或 dict（包含 "values" 键）
         """
         sheet_name = self.excel_tool.get_sheet_names()[0]
-        sheet = self.excel_tool.get_sheet(sheet_name)
-
-        # 清空整个表格
-        max_row = sheet.max_row
-        max_col = sheet.max_column
-        if max_row > 0:
-            sheet.delete_rows(1, max_row)
-        if max_col > 0:
-            sheet.delete_cols(1, max_col)
 
         # 兼容两种数据格式
         if isinstance(data, dict):
@@ -396,103 +496,134 @@ class ExcelPreviewControl(ft.Column):
         else:
             raise ValueError("data 必须是 list 或 dict 类型")
 
-        if not values:
-            self.excel_tool.save()
+        # 按表头对应的列类型整列转换，write-only 模式整表重建后原子替换文件
+        rows = SAMPLE_SHEET_SCHEMA.convert_rows(values)
+        self.excel_tool.write_sheet_rows(sheet_name, rows)
+        self._page.update()
+
+    def show_filter_dialog(self, e):
+        """显示剔除空值的列选择对话框（列来自当前工作表的表头）"""
+        sheet_name = self.sheet_dropdown.value
+        if not sheet_name or not os.path.exists(self.excel_tool.file_path):
+            self._page.snack_bar = ft.SnackBar(ft.Text("没有可筛选的工作表 ❌"), open=True)
             self._page.update()
             return
 
-        # 写入表头 + 数据
-        for row_idx, row_data in enumerate(values, start=1):
-            for col_idx, value in enumerate(row_data, start=1):
-                # 处理链接类型
-                if isinstance(value, list) and value and isinstance(value[0], dict) and "link" in value[0]:
-                    cell_value = value[0]["link"]
-                # 处理日期列（17、18列）
-                elif isinstance(value, (int, float)) and col_idx in [17, 18]:
-                    try:
-                        cell_value = datetime.fromordinal(
-                            datetime(1900, 1, 1).toordinal() + int(value) - 2
-                        ).strftime("%Y-%m-%d")
-                    except (ValueError, TypeError):
-                        cell_value = value
-                else:
-                    cell_value = value
+        self.filter_checkboxes = {
+            name: ft.Checkbox(label=name, value=False) for name in self._read_header_names(sheet_name)
+        }
+        self.filter_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("剔除以下列为空的行", size=20, weight=ft.FontWeight.BOLD),
+            content=ft.Container(
+                content=ft.Column(
+                    controls=list(self.filter_checkboxes.values()),
+                    scroll=ft.ScrollMode.AUTO,
+                    tight=True,
+                ),
+                width=400,
+                height=min(400, len(self.filter_checkboxes) * 50 + 100),
+            ),
+            actions=[
+                ft.TextButton("取消", on_click=lambda _: self._page.close(self.filter_dialog)),
+                ft.ElevatedButton(
+                    "确认剔除",
+                    on_click=self.confirm_filter,
+                    style=ft.ButtonStyle(
+                        bgcolor=ft.Colors.BLUE_400,
+                        color=ft.Colors.WHITE,
+                    )
+                ),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self._page.open(self.filter_dialog)
+
+    def confirm_filter(self, e):
+        """确认剔除空值"""
+        selected_cols = [name for name, checkbox in self.filter_checkboxes.items() if checkbox.value]
+        self._page.close(self.filter_dialog)
+        if not selected_cols:
+            self._page.snack_bar = ft.SnackBar(ft.Text("未选择任何列 ⚠️"), open=True)
+            self._page.update()
+            return
+        # 在 Flet 事件循环中异步执行，筛选与写回不阻塞 UI
+        self._page.run_task(self.filter_non_empty_rows_async, selected_cols)
 
-                self.excel_tool.write_cell(
-                    sheet=sheet,
-                    row=row_idx,
-                    col=col_idx,
-                    value=cell_value,
-                )
+    def _read_header_names(self, sheet_name: str) -> list:
+        rows = self.excel_tool.iter_sheet_values(sheet_name)
+        try:
+            return header_names(next(islice(rows, self.excel_tool.header_row - 1, None), None))
+        finally:
+            rows.close()
 
-        self.excel_tool.save()
+    def _filter_non_empty(self, sheet_name: str, selected_cols: list[str]):
+        """
+        剔除指定列为空的行并覆写文件（只做文件操作，可在线程中执行）
+        :return: filter_rows 的统计结果；表头中一列都不存在时不做任何修改，返回 None
+        """
+        # 不存在的列忽略
+        header = self._read_header_names(sheet_name)
+        columns = [name for name in selected_cols if name in header]
+        if not columns:
+            return None
+        row_filter = RowFilter("剔除空值", All(*(col(name).not_empty(strip=True) for name in columns)))
+        # 读取、筛选与写回在同一次流式遍历中完成，写完后原子替换文件
+        return self.excel_tool.filter_rows(sheet_name, row_filter)
+
+    def _show_filter_result(self, selected_cols, counts):
+        if counts is None:
+            msg = f"表头中没有所选的列: {selected_cols}"
+            logger.warning(msg)
+        else:
+            msg = f"✅ 已剔除 {counts['removed']} 行空值数据（共 {counts['total']} 行），并覆写文件"
+            logger.success(msg)
+        self._page.snack_bar = ft.SnackBar(ft.Text(msg), open=True)
+        self._page.update()
+
+    def _show_filter_error(self, ex):
+        logger.error(f"剔除空值失败: {ex}")
+        self._page.snack_bar = ft.SnackBar(ft.Text(f"剔除失败: {ex}"), open=True)
         self._page.update()
 
     def filter_non_empty_rows(self, selected_cols: list[str]):
         """剔除指定列为空的行，并覆写 Excel 文件"""
-        file_path = self.excel_tool.file_path
-        if not os.path.exists(file_path):
+        if not os.path.exists(self.excel_tool.file_path):
             self._page.snack_bar = ft.SnackBar(ft.Text("文件不存在 ❌"), open=True)
             self._page.update()
             return
 
         try:
             sheet_name = self.sheet_dropdown.value
-            sheet = self.excel_tool.get_sheet(sheet_name)
-            row_count = self.excel_tool.get_row_count(sheet)
-            col_count = self.excel_tool.get_column_count(sheet)
-
-            headers = [
-                sheet.cell(row=self.excel_tool.header_row, column=col).value or f"Column {col}"
-                for col in range(1, col_count + 1)
-            ]
-
-            selected_col_indices = [
-                headers.index(col_name) + 1 for col_name in selected_cols if col_name in headers
-            ]
-
-            data_rows = self.excel_tool.read_range(
-                sheet,
-                start_row=self.excel_tool.header_row + 1,
-                start_col=1,
-                end_row=row_count,
-                end_col=col_count,
-                skip_headers=True
-            )
-
-            filtered_rows = []
-            for row in data_rows:
-                keep = all(
-                    str(row[idx - 1]).strip() != "" and row[idx - 1] is not None
-                    for idx in selected_col_indices
-                )
-                if keep:
-                    filtered_rows.append(row)
-
-            # 清空旧数据
-            for r in range(self.excel_tool.header_row + 1, row_count + 1):
-                for c in range(1, col_count + 1):
-                    sheet.cell(row=r, column=c).value = None
-
-            # 写回过滤后的数据
-            self.excel_tool.write_range(sheet, self.excel_tool.header_row + 1, 1, filtered_rows)
-            self.excel_tool.save()
-            self.update_table(sheet_name)
+            counts = self._filter_non_empty(sheet_name, selected_cols)
+            if counts is not None:
+                self.update_table(sheet_name)
+            self._show_filter_result(selected_cols, counts)
+        except Exception as ex:
+            self._show_filter_error(ex)
 
-            msg = f"✅ 已剔除 {len(data_rows) - len(filtered_rows)} 行空值数据，并覆写文件"
-            logger.success(msg)
-            self._page.snack_bar = ft.SnackBar(ft.Text(msg), open=True)
+    async def filter_non_empty_rows_async(self, selected_cols: list[str]):
+        """filter_non_empty_rows 的异步版本，通过 page.run_task 运行：文件操作在线程中进行"""
+        if not os.path.exists(self.excel_tool.file_path):
+            self._page.snack_bar = ft.SnackBar(ft.Text("文件不存在 ❌"), open=True)
             self._page.update()
+            return
 
+        try:
+            sheet_name = self.sheet_dropdown.value
+            counts = await asyncio.to_thread(self._filter_non_empty, sheet_name, selected_cols)
+            if counts is not None:
+                await self.update_table_async(sheet_name)
+            self._show_filter_result(selected_cols, counts)
         except Exception as ex:
-            logger.error(f"剔除空值失败: {ex}")
-            self._page.snack_bar = ft.SnackBar(ft.Text(f"剔除失败: {ex}"), open=True)
-            self._page.update()
+            self._show_filter_error(ex)
 
     def change_workbook(self, file_path: str):
-        self.excel_tool.file_path = file_path
-        self.excel_tool.workbook = self.excel_tool.load_workbook(file_path) if os.path.exists(
-            file_path) else self.excel_tool.create_workbook()
+        self.excel_tool.file_path = Path(file_path)
+        # 已存在的文件交给工作簿缓存按需加载（未变化时复用）
+        self.excel_tool.workbook = None if os.path.exists(file_path) else self.excel_tool.create_workbook()
+        # 用户选择的已有文件整表覆写时只替换单元格值，保留原有格式
+        self.excel_tool.managed = not os.path.exists(file_path)
         self.sheet_dropdown.options = [ft.dropdown.Option(sheet) for sheet in self.excel_tool.get_sheet_names()]
         self.sheet_dropdown.value = self.excel_tool.get_sheet_names()[0] if self.excel_tool.get_sheet_names() else None
         self.update_table(self.sheet_dropdown.value)
@@ -0,0 +1,192 @@
+import flet as ft
+import numpy as np
+from core.logger import logger
+
+# 每页行数选项
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+# 滚动到底部时每次追加的行数不超过一页，单页最多展开到该行数，再多需要翻页
+MAX_WINDOW_ROWS = 1000
+
+
+class PagedDataTable(ft.Column):
+    """
+    分页 / 窗口化的表格预览
+    - 数据按列保存（每列一个 numpy object 数组），不为每个单元格创建控件
+    - 只渲染当前窗口内的行：翻页、跳转到指定行、滚动到底部时追加下一批
+    - 渲染耗时只与窗口大小有关，与表的总行数无关
+    """
+
+    def __init__(self, page: ft.Page, page_size: int = 100):
+        super().__init__()
+        self._page = page
+        self.page_size = page_size
+        self.headers = []
+        self.columns_data = []
+        self.row_count = 0
+        # 当前窗口 [window_start, window_end)
+        self.window_start = 0
+        self.window_end = 0
+
+        self.table = ft.DataTable(
+            columns=[],
+            rows=[],
+            border=ft.border.all(1, ft.Colors.GREY_400),
+            heading_row_color=ft.Colors.GREY_200,
+            expand=True,
+            column_spacing=10,
+        )
+        self.page_label = ft.Text("")
+        self.page_size_dropdown = ft.Dropdown(
+            label="每页行数",
+            options=[ft.dropdown.Option(str(size)) for size in PAGE_SIZE_OPTIONS],
+            value=str(page_size),
+            width=120,
+            on_change=self.on_page_size_change,
+        )
+        self.jump_input = ft.TextField(
+            label="跳转到行",
+            width=120,
+            keyboard_type=ft.KeyboardType.NUMBER,
+            on_submit=self.on_jump,
+        )
+        self.first_button = ft.IconButton(ft.Icons.FIRST_PAGE, on_click=lambda e: self.go_to_page(0))
+        self.prev_button = ft.IconButton(ft.Icons.CHEVRON_LEFT, on_click=self.on_prev)
+        self.next_button = ft.IconButton(ft.Icons.CHEVRON_RIGHT, on_click=self.on_next)
+        self.last_button = ft.IconButton(ft.Icons.LAST_PAGE, on_click=lambda e: self.go_to_page(self.page_count - 1))
+
+        self.scroll_column = ft.Column(
+            controls=[
+                ft.Row(
+                    scroll=ft.ScrollMode.ALWAYS,
+                    controls=[self.table],
+                )
+            ],
+            scroll=ft.ScrollMode.ALWAYS,
+            expand=True,
+            on_scroll_interval=100,
+            on_scroll=self.on_scroll,
+        )
+
+        self.controls = [
+            ft.Container(content=self.scroll_column, expand=True),
+            ft.Row(
+                [self.first_button, self.prev_button, self.page_label, self.next_button, self.last_button,
+                 self.page_size_dropdown, self.jump_input],
+                alignment=ft.MainAxisAlignment.CENTER,
+                spacing=10,
+            ),
+        ]
+        self.expand = True
+
+    # ---------------- 数据 ----------------
+    def set_data(self, headers, rows):
+        """
+        设置表头与数据并回到第一页
+        :param rows: 数据行的可迭代对象（可以是生成器），只在这里遍历一次转换为列
+        """
+        self.headers = list(headers)
+        width = len(self.headers)
+        buffer = [(tuple(row) + (None,) * (width - len(row)))[:width] for row in rows]
+        self.row_count = len(buffer)
+        self.columns_data = [
+            np.fromiter((row[idx] for row in buffer), dtype=object, count=self.row_count)
+            for idx in range(width)
+        ]
+        self.table.columns = [
+            ft.DataColumn(
+                ft.Text(
+                    header,
+                    weight=ft.FontWeight.BOLD,
+                    text_align=ft.TextAlign.CENTER,
+                )
+            )
+            for header in self.headers
+        ]
+        self._show_window(0)
+
+    def clear(self):
+        self.set_data([], [])
+
+    # ---------------- 分页 ----------------
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-self.row_count // self.page_size))
+
+    @property
+    def page_index(self) -> int:
+        return -(-self.window_start // self.page_size)
+
+    def go_to_page(self, index: int):
+        index = min(max(index, 0), self.page_count - 1)
+        self._show_window(index * self.page_size)
+        self._page.update()
+
+    def on_prev(self, e):
+        self._show_window(max(0, self.window_start - self.page_size))
+        self._page.update()
+
+    def on_next(self, e):
+        # 滚动追加过的行已经看过，下一页从窗口末尾开始
+        if self.window_end < self.row_count:
+            self._show_window(self.window_end)
+            self._page.update()
+
+    def go_to_row(self, row_number: int):
+        """跳转到第 row_number 条数据（1-based，不含表头）所在的页"""
+        self.go_to_page((min(max(row_number, 1), max(self.row_count, 1)) - 1) // self.page_size)
+
+    def on_page_size_change(self, e):
+        first_row = self.window_start
+        self.page_size = int(self.page_size_dropdown.value)
+        self.go_to_page(first_row // self.page_size)
+
+    def on_jump(self, e):
+        try:
+            self.go_to_row(int(self.jump_input.value))
+        except (TypeError, ValueError):
+            logger.warning(f"无效的行号: {self.jump_input.value}")
+
+    def on_scroll(self, e: ft.OnScrollEvent):
+        """滚动接近底部时追加下一批行，窗口达到上限后需要翻页"""
+        if e.max_scroll_extent and e.pixels >= e.max_scroll_extent - 50:
+            if self.window_end < self.row_count and self.window_end - self.window_start < MAX_WINDOW_ROWS:
+                self._append_rows(min(self.page_size, self.row_count - self.window_end))
+                self._page.update()
+
+    # ---------------- 渲染 ----------------
+    def _build_rows(self, start: int, end: int):
+        columns = [column[start:end] for column in self.columns_data]
+        return [
+            ft.DataRow(
+                cells=[
+                    ft.DataCell(
+                        ft.Text(
+                            str(cell) if cell is not None else "",
+                            text_align=ft.TextAlign.CENTER
+                        ),
+                    ) for cell in row
+                ]
+            )
+            for row in zip(*columns)
+        ]
+
+    def _show_window(self, start: int):
+        self.window_start = start
+        self.window_end = min(start + self.page_size, self.row_count)
+        self.table.rows = self._build_rows(self.window_start, self.window_end)
+        self._update_pager()
+
+    def _append_rows(self, count: int):
+        end = self.window_end + count
+        self.table.rows.extend(self._build_rows(self.window_end, end))
+        self.window_end = end
+        self._update_pager()
+
+    def _update_pager(self):
+        if self.row_count:
+            self.page_label.value = (f"第 {self.page_index + 1}/{self.page_count} 页，"
+                                     f"显示 {self.window_start + 1}-{self.window_end} 行，共 {self.row_count} 行")
+        else:
+            self.page_label.value = "暂无数据"
+        self.first_button.disabled = self.prev_button.disabled = self.window_start == 0
+        self.next_button.disabled = self.last_button.disabled = self.window_end >= self.row_count
@@ -1,8 +1,10 @@
-﻿import flet as ft
+﻿import asyncio
+import flet as ft
 import flet_webview as ftwv
 from core.logger import logger
 from core.env import SPREADSHEET_TOKEN
-from modes.mode_drive_api import get_spreadsheetToken, get_spreadsheet_Id
+from modes.mode_drive_api import get_spreadsheetToken, get_spreadsheet_Id_async
+from modes.persistence.metadata_cache import metadata_cache
 
 
 class HomePage(ft.Column):
@@ -46,7 +48,7 @@ class HomePage(ft.Column):
             options=spreadsheet_options,
             width=200,
             disabled=not spreadsheet_options,
-            on_change=self._on_spread_sheet_change,
+            on_change=lambda e: self.page.run_task(self._on_spread_sheet_change_async, e),
         )
 
         # 修改：sheets 现在是字典 {title: sheet_id}
@@ -72,7 +74,7 @@ class HomePage(ft.Column):
         update_button = ft.ElevatedButton(
             text="重新获取数据",
             icon=ft.Icons.REFRESH,
-            on_click=self.on_update_cache_click,
+            on_click=lambda e: self.page.run_task(self.on_update_cache_click_async, e),
         )
 
         # 配置板块容器
@@ -114,22 +116,29 @@ class HomePage(ft.Column):
     def _on_type_change(self, e):
         self._update_spreadsheet_dropdown()
 
+    @staticmethod
+    def _files_signature(files):
+        """文件列表的内容（与顺序无关）"""
+        return {(f.get('token'), f.get('name'), f.get('type')) for f in files or []}
+
     def _update_spreadsheet_dropdown(self):
         filtered_files = [f for f in self.files if f['type'] == 'sheet']
 
         options = [
             ft.dropdown.Option(key=f['token'], text=f['name']) for f in filtered_files
         ]
-        logger.info(f"sheet_token=>{options[0].key}")
-
         self.dropdown_spreadsheet.options = options
-        self.dropdown_spreadsheet.value = options[0].key if options else None
+        # 重新扫描后尽量保留当前选中的表格
+        keys = [option.key for option in options]
+        if self.dropdown_spreadsheet.value not in keys:
+            self.dropdown_spreadsheet.value = keys[0] if keys else None
+        logger.info(f"sheet_token=>{self.dropdown_spreadsheet.value}")
         self.dropdown_spreadsheet.disabled = len(options) == 0
         self.dropdown_spreadsheet.label = "暂无数据" if len(options) == 0 else "选择表格"
 
         # 如果有选中值，触发更新 sheet 下拉框
         if self.dropdown_spreadsheet.value:
-            self._on_spread_sheet_change(None)
+            self.page.run_task(self._on_spread_sheet_change_async, None)
         else:
             # 清空 sheet 下拉框
             self.dropdown_sheet.options = []
@@ -138,7 +147,8 @@ class HomePage(ft.Column):
 
         self.page.update()
 
-    def _on_spread_sheet_change(self, e):
+    async def _on_spread_sheet_change_async(self, e):
+        """表格切换后获取其 sheets，通过 page.run_task 运行"""
         main_app = self.page.data.get("main_app") if hasattr(self, "page") else None
         if main_app and main_app.auth_status:
             spreadsheet_token = self.dropdown_spreadsheet.value
@@ -147,28 +157,8 @@ class HomePage(ft.Column):
             access_token = main_app.token_storage.get("user_token")
 
             try:
-                sheets = get_spreadsheet_Id(access_token, spreadsheet_token)
-
-                # 修改：创建显示 title，值为 sheet_id 的选项
-                options = [
-                    ft.dropdown.Option(key=s['sheet_id'], text=s['title']) for s in sheets
-                ]
-                self.dropdown_sheet.options = options
-                self.dropdown_sheet.value = options[0].key if options else None
-                self.dropdown_sheet.disabled = len(options) == 0
-                self.dropdown_sheet.label = "暂无数据" if len(options) == 0 else "选择表"
-
-                if main_app and main_app.auth_status:
-                    # 修改：存储为字典 {title: sheet_id}
-                    sheets_dict = {s["title"]: s["sheet_id"] for s in sheets if "sheet_id" in s and "title" in s}
-                    main_app.sheet_storage.set("sheets", sheets_dict)
-                    logger.info(f"表数据更新为: {sheets_dict}")
-                else:
-                    logger.error("请先完成飞书授权")
-
-                # 如果有选中值，触发 sheet change
-                # if self.dropdown_sheet.value:
-                #    self._on_sheet_change(None)
+                sheets = await get_spreadsheet_Id_async(access_token, spreadsheet_token)
+                self._apply_sheets(main_app, sheets)
             except Exception as ex:
                 logger.error(f"获取 sheets 失败: {ex}")
                 self.page.snack_bar = ft.SnackBar(ft.Text(f"获取 sheets 失败: {str(ex)}"))
@@ -177,6 +167,25 @@ class HomePage(ft.Column):
         else:
             logger.error("请先完成飞书授权")
 
+    def _apply_sheets(self, main_app, sheets):
+        """用获取到的 sheets 更新下拉框并持久化"""
+        # 修改：创建显示 title，值为 sheet_id 的选项
+        options = [
+            ft.dropdown.Option(key=s['sheet_id'], text=s['title']) for s in sheets
+        ]
+        self.dropdown_sheet.options = options
+        self.dropdown_sheet.value = options[0].key if options else None
+        self.dropdown_sheet.disabled = len(options) == 0
+        self.dropdown_sheet.label = "暂无数据" if len(options) == 0 else "选择表"
+
+        if main_app and main_app.auth_status:
+            # 修改：存储为字典 {title: sheet_id}
+            sheets_dict = {s["title"]: s["sheet_id"] for s in sheets if "sheet_id" in s and "title" in s}
+            main_app.sheet_storage.set("sheets", sheets_dict)
+            logger.info(f"表数据更新为: {sheets_dict}")
+        else:
+            logger.error("请先完成飞书授权")
+
     def _on_sheet_change(self, e):
         main_app = self.page.data.get("main_app") if hasattr(self, "page") else None
         if main_app and main_app.auth_status:
@@ -185,14 +194,27 @@ class HomePage(ft.Column):
         else:
             logger.error("请先完成飞书授权")
 
-    def on_update_cache_click(self, e):
+    async def on_update_cache_click_async(self, e):
+        """刷新云空间文件列表，通过 page.run_task 运行"""
         main_app = self.page.data.get("main_app") if hasattr(self, "page") else None
         if main_app and main_app.auth_status:
             access_token = main_app.token_storage.get("user_token")
+            # 手动刷新时丢弃元数据缓存，强制重新拉取
+            if e is not None:
+                metadata_cache.invalidate()
+            # 先用本地索引立即填充下拉框，再在后台扫描云空间（只重新列出有变化的文件夹）
+            if not self.files:
+                self.files = get_spreadsheetToken(access_token, use_index=True)
+                if self.files:
+                    self._update_spreadsheet_dropdown()
+                    self.page.update()
             try:
-                self.files = get_spreadsheetToken(access_token)
-                logger.info(f"获取文档数据成功=>{self.files}")
-                self._update_spreadsheet_dropdown()
+                files = await asyncio.to_thread(get_spreadsheetToken, access_token)
+                logger.info(f"获取文档数据成功=>{files}")
+                # 云空间扫描结果的顺序不固定，按内容比较，没有变化时不重绘下拉框
+                if self._files_signature(files) != self._files_signature(self.files):
+                    self.files = files
+                    self._update_spreadsheet_dropdown()
                 self.page.snack_bar = ft.SnackBar(ft.Text("数据更新成功 ✅"))
                 self.page.snack_bar.open = True
             except Exception as ex: